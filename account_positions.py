@@ -52,8 +52,7 @@ def get_tp_sl_orders(symbol, position_side):
     # -------------------------------
     try:
         open_orders = client.futures_get_open_orders(
-            symbol=symbol,
-            requests_params={"timeout": 20}
+            symbol=symbol
         )
     except Exception:
         open_orders = []
@@ -81,8 +80,7 @@ def get_tp_sl_orders(symbol, position_side):
     try:
         algo_orders = client.futures_get_open_orders(
             symbol=symbol,
-            conditional=True,
-            requests_params={"timeout": 20}
+            conditional=True
         )
     except Exception:
         algo_orders = []
@@ -103,10 +101,10 @@ def get_tp_sl_orders(symbol, position_side):
     return orders
 
 def get_account_status():
-    data = client.futures_account(requests_params={"timeout": 20})  # /fapi/v2/account
+    data = client.futures_account()  # /fapi/v2/account
 
     # 获取所有交易对的标记价格
-    premium = client.futures_mark_price(requests_params={"timeout": 20})
+    premium = client.futures_mark_price()
     mark_dict = {item["symbol"]: float(item["markPrice"]) for item in premium}
 
     balance = float(data.get("totalWalletBalance", 0))
@@ -135,9 +133,8 @@ def get_account_status():
 
         # 🔥 查询该 symbol & direction 的 TP/SL
         orders = get_tp_sl_orders(symbol, pos_side)
-        if symbol not in tp_sl_cache:
-            tp_sl_cache[symbol] = {}
-        tp_sl_cache[symbol][pos_side] = orders
+        # setdefault：并发下单时多个线程可能同时刷新该缓存
+        tp_sl_cache.setdefault(symbol, {})[pos_side] = orders
 
         positions.append({
             "symbol": symbol,
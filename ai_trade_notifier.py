@@ -1,20 +1,17 @@
 from notifier import queue_message
 from database import redis_client
-import json
+from kline_fetcher import LATEST_KEY, decode_kline
 
 def _get_latest_5m_close(symbol):
     key = f"historical_data:{symbol}:5m"
     try:
-        if not redis_client.exists(key):
+        pipe = redis_client.pipeline()
+        pipe.exists(key)
+        pipe.hget(LATEST_KEY, f"{symbol}:5m")
+        exists, raw = pipe.execute()
+        if not exists or not raw:
             return None
-        fields = redis_client.hkeys(key)
-        if not fields:
-            return None
-        latest_ts = max(int(x) for x in fields)
-        raw = redis_client.hget(key, latest_ts)
-        if not raw:
-            return None
-        return json.loads(raw).get("Close")
+        return decode_kline(raw).get("Close")
     except Exception:
         return None
 
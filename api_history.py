@@ -1,7 +1,9 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Query
 from fastapi.responses import HTMLResponse
 from typing import Optional
-import json
+import anyio.to_thread
+import orjson
 import uvicorn
 from database import redis_client
 from fastapi.staticfiles import StaticFiles
@@ -9,38 +11,51 @@ from fastapi.staticfiles import StaticFiles
 KEY_REQ = "deepseek_analysis_request_history"
 KEY_RES = "deepseek_analysis_response_history"
 
-app = FastAPI(title="DeepSeek Analysis History API")
+# 读取 Redis 的接口都是同步 def，由 Starlette 放进线程池执行，不阻塞事件循环
+THREADPOOL_TOKENS = 100
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_TOKENS
+    yield
+
+
+app = FastAPI(title="DeepSeek Analysis History API", lifespan=lifespan)
 
 def _read_list(key: str, limit: int):
     items = redis_client.lrange(key, 0, limit - 1)
     result = []
     for item in items:
         try:
-            result.append(json.loads(item))
+            result.append(orjson.loads(item))
         except Exception:
             result.append({"raw": item})
     return result
 
 
 @app.get("/requests")
-async def get_requests(limit: Optional[int] = Query(50, ge=1, le=500)):
+def get_requests(limit: Optional[int] = Query(50, ge=1, le=500)):
     return {"count": limit, "data": _read_list(KEY_REQ, limit)}
 
 
 @app.get("/responses")
-async def get_responses(limit: Optional[int] = Query(50, ge=1, le=500)):
+def get_responses(limit: Optional[int] = Query(50, ge=1, le=500)):
     return {"count": limit, "data": _read_list(KEY_RES, limit)}
 
 @app.get("/latest")
-async def get_latest_pair(limit: int = Query(1, ge=1, le=300)):
-    reqs = redis_client.lrange(KEY_REQ, 0, limit - 1)
-    ress = redis_client.lrange(KEY_RES, 0, limit - 1)
+def get_latest_pair(limit: int = Query(1, ge=1, le=300)):
+    # 两个列表合并为一次 pipeline 往返
+    pipe = redis_client.pipeline()
+    pipe.lrange(KEY_REQ, 0, limit - 1)
+    pipe.lrange(KEY_RES, 0, limit - 1)
+    reqs, ress = pipe.execute()
 
     def safe(x):
         if not x:
             return None
         try:
-            return json.loads(x)
+            return orjson.loads(x)
         except:
             return {"raw": x}
 
@@ -231,10 +246,14 @@ async def history_page():
 
 if __name__ == "__main__":
     import os
+    import sys
     filename = os.path.basename(__file__).replace(".py", "")
     uvicorn.run(
         f"{filename}:app",
         host="0.0.0.0",
         port=8600,
-        reload=True
+        reload=True,
+        # uvloop 不支持 Windows，其它平台显式指定，避免缺包时静默回退
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
     )
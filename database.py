@@ -1,5 +1,10 @@
+import bisect
+import collections
 import fnmatch
+import itertools
+import os
 import threading
+import time
 import redis
 from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError
 from config import REDIS_HOST, REDIS_PORT, REDIS_DB
@@ -16,6 +21,66 @@ class InMemoryPipeline:
         self.ops.append(("hset", key, field, value))
         return self
 
+    def hget(self, key, field):
+        self.ops.append(("hget", key, field))
+        return self
+
+    def hgetall(self, key):
+        self.ops.append(("hgetall", key))
+        return self
+
+    def hdel(self, key, *fields):
+        self.ops.append(("hdel", key, *fields))
+        return self
+
+    def exists(self, key):
+        self.ops.append(("exists", key))
+        return self
+
+    def lpush(self, key, value):
+        self.ops.append(("lpush", key, value))
+        return self
+
+    def lrange(self, key, start, end):
+        self.ops.append(("lrange", key, start, end))
+        return self
+
+    def delete(self, *keys):
+        self.ops.append(("delete", *keys))
+        return self
+
+    def unlink(self, *keys):
+        self.ops.append(("unlink", *keys))
+        return self
+
+    def zadd(self, key, mapping):
+        self.ops.append(("zadd", key, mapping))
+        return self
+
+    def zrange(self, key, start, end, withscores=False):
+        self.ops.append(("zrange", key, start, end, withscores))
+        return self
+
+    def zrangebyscore(self, key, min, max):
+        self.ops.append(("zrangebyscore", key, min, max))
+        return self
+
+    def zremrangebyscore(self, key, min, max):
+        self.ops.append(("zremrangebyscore", key, min, max))
+        return self
+
+    def zcard(self, key):
+        self.ops.append(("zcard", key))
+        return self
+
+    def sadd(self, key, *values):
+        self.ops.append(("sadd", key, *values))
+        return self
+
+    def srem(self, key, *values):
+        self.ops.append(("srem", key, *values))
+        return self
+
     def execute(self):
         results = []
         for op in self.ops:
@@ -35,6 +100,54 @@ class InMemoryPipeline:
         return True
 
 
+LOCK_STRIPES = 64
+REDIS_HEALTH_CHECK_SEC = 30
+
+
+def _index_range(n, start, end):
+    """Redis 风格的闭区间下标（支持负数）→ Python 切片 [lo, hi)"""
+    if start < 0:
+        start = max(n + start, 0)
+    if end is None or end >= n:
+        end_idx = n
+    else:
+        end_idx = (n + end if end < 0 else end) + 1
+    return start, max(end_idx, start)
+
+
+def _score_bound(value):
+    """zrangebyscore 的边界：数字 / "-inf" / "+inf" / "(x"（开区间）→ (score, exclusive)"""
+    if isinstance(value, str) and value.startswith("("):
+        return float(value[1:]), True
+    return float(value), False
+
+
+class _SortedSet:
+    """按 score 有序的 (score, member) 列表 + member → score 索引"""
+
+    def __init__(self):
+        self.items = []
+        self.scores = {}
+
+    def add(self, member, score):
+        old = self.scores.get(member)
+        if old is not None:
+            if old == score:
+                return 0
+            del self.items[bisect.bisect_left(self.items, (old, member))]
+        self.scores[member] = score
+        bisect.insort(self.items, (score, member))
+        return 1 if old is None else 0
+
+    def span(self, low, high):
+        lo, lo_open = _score_bound(low)
+        hi, hi_open = _score_bound(high)
+        score = lambda x: x[0]
+        i = (bisect.bisect_right if lo_open else bisect.bisect_left)(self.items, lo, key=score)
+        j = (bisect.bisect_left if hi_open else bisect.bisect_right)(self.items, hi, key=score)
+        return i, max(i, j)
+
+
 class InMemoryRedis:
     """
     Very small in-process Redis mock.
@@ -43,27 +156,64 @@ class InMemoryRedis:
 
     def __init__(self):
         self._data = {}
-        self._lock = threading.RLock()
+        self._expire_at = {}
+        # 按 key 分段加锁：不同 key 的并发操作互不阻塞
+        self._locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+
+    def _lk(self, key):
+        return self._locks[hash(key) % LOCK_STRIPES]
+
+    def _expired(self, key):
+        deadline = self._expire_at.get(key)
+        if deadline is not None and time.time() >= deadline:
+            self._data.pop(key, None)
+            del self._expire_at[key]
+            return True
+        return False
 
     def keys(self, pattern="*"):
-        with self._lock:
-            return [k for k in self._data.keys() if fnmatch.fnmatch(k, pattern)]
+        # list(dict) 在 CPython 中是原子快照，无需全局锁
+        return [k for k in list(self._data) if fnmatch.fnmatch(k, pattern)]
+
+    def scan_iter(self, match="*", count=None):
+        yield from self.keys(match)
 
     def delete(self, *keys):
         removed = 0
-        with self._lock:
-            for k in keys:
+        for k in keys:
+            with self._lk(k):
+                self._expire_at.pop(k, None)
                 if k in self._data:
                     del self._data[k]
                     removed += 1
         return removed
 
+    # 内存模式下没有后台回收，UNLINK 与 DEL 等价
+    unlink = delete
+
     def exists(self, key):
-        with self._lock:
+        with self._lk(key):
+            if self._expired(key):
+                return 0
             return 1 if key in self._data else 0
 
+    def get(self, key):
+        with self._lk(key):
+            if self._expired(key):
+                return None
+            return self._data.get(key)
+
+    def set(self, key, value, ex=None):
+        with self._lk(key):
+            self._data[key] = value
+            if ex:
+                self._expire_at[key] = time.time() + ex
+            else:
+                self._expire_at.pop(key, None)
+        return True
+
     def hset(self, key, field, value):
-        with self._lock:
+        with self._lk(key):
             bucket = self._data.setdefault(key, {})
             if not isinstance(bucket, dict):
                 bucket = {}
@@ -72,22 +222,33 @@ class InMemoryRedis:
         return 1
 
     def hget(self, key, field):
-        with self._lock:
+        with self._lk(key):
             bucket = self._data.get(key, {})
             return bucket.get(str(field)) if isinstance(bucket, dict) else None
 
     def hgetall(self, key):
-        with self._lock:
+        with self._lk(key):
             bucket = self._data.get(key, {})
             return dict(bucket) if isinstance(bucket, dict) else {}
 
     def hkeys(self, key):
-        with self._lock:
+        with self._lk(key):
             bucket = self._data.get(key, {})
             return list(bucket.keys()) if isinstance(bucket, dict) else []
 
+    def hdel(self, key, *fields):
+        with self._lk(key):
+            bucket = self._data.get(key)
+            if not isinstance(bucket, dict):
+                return 0
+            removed = 0
+            for f in fields:
+                if bucket.pop(str(f), None) is not None:
+                    removed += 1
+            return removed
+
     def sadd(self, key, *values):
-        with self._lock:
+        with self._lk(key):
             s = self._data.setdefault(key, set())
             if not isinstance(s, set):
                 s = set()
@@ -97,7 +258,7 @@ class InMemoryRedis:
             return len(s) - before
 
     def srem(self, key, *values):
-        with self._lock:
+        with self._lk(key):
             s = self._data.get(key, set())
             removed = 0
             for v in values:
@@ -107,39 +268,93 @@ class InMemoryRedis:
             return removed
 
     def smembers(self, key):
-        with self._lock:
+        with self._lk(key):
             s = self._data.get(key, set())
             return set(s) if isinstance(s, set) else set()
 
     def lpush(self, key, value):
-        with self._lock:
-            lst = self._data.setdefault(key, [])
-            if not isinstance(lst, list):
-                lst = []
+        with self._lk(key):
+            lst = self._data.get(key)
+            if not isinstance(lst, collections.deque):
+                # deque.appendleft 为 O(1)；与真实 Redis 一致，不截断
+                lst = collections.deque()
                 self._data[key] = lst
-            lst.insert(0, value)
+            lst.appendleft(value)
             return len(lst)
 
     def lrange(self, key, start, end):
-        with self._lock:
-            lst = self._data.get(key, [])
-            if not isinstance(lst, list):
+        with self._lk(key):
+            lst = self._data.get(key)
+            if not isinstance(lst, collections.deque):
                 return []
-            # Redis lrange end is inclusive
-            if end is None or end >= len(lst):
-                end_idx = len(lst)
-            else:
-                end_idx = end + 1
-            return lst[start:end_idx]
-
-    def pipeline(self):
+            # Redis lrange end is inclusive, negative indexes count from the tail
+            lo, hi = _index_range(len(lst), start, end)
+            return list(itertools.islice(lst, lo, hi))
+
+    def _zset(self, key, create=False):
+        zs = self._data.get(key)
+        if not isinstance(zs, _SortedSet):
+            if not create:
+                return None
+            zs = _SortedSet()
+            self._data[key] = zs
+        return zs
+
+    def zadd(self, key, mapping):
+        with self._lk(key):
+            zs = self._zset(key, create=True)
+            return sum(zs.add(m, float(sc)) for m, sc in mapping.items())
+
+    def zrange(self, key, start, end, withscores=False):
+        with self._lk(key):
+            zs = self._zset(key)
+            if zs is None:
+                return []
+            lo, hi = _index_range(len(zs.items), start, end)
+            part = zs.items[lo:hi]
+        return [(m, sc) for sc, m in part] if withscores else [m for _, m in part]
+
+    def zrangebyscore(self, key, min, max):
+        with self._lk(key):
+            zs = self._zset(key)
+            if zs is None:
+                return []
+            i, j = zs.span(min, max)
+            return [m for _, m in zs.items[i:j]]
+
+    def zremrangebyscore(self, key, min, max):
+        with self._lk(key):
+            zs = self._zset(key)
+            if zs is None:
+                return 0
+            i, j = zs.span(min, max)
+            for _, m in zs.items[i:j]:
+                del zs.scores[m]
+            del zs.items[i:j]
+            return j - i
+
+    def zcard(self, key):
+        with self._lk(key):
+            zs = self._zset(key)
+            return len(zs.items) if zs is not None else 0
+
+    def pipeline(self, transaction=True):
         return InMemoryPipeline(self)
 
 
 def _init_redis_client():
-    client = redis.StrictRedis(
-        host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True
-    )
+    # Redis 与本程序同机部署时可设置 REDIS_SOCKET 走 UNIX socket，省去 TCP 回环开销
+    socket_path = os.environ.get("REDIS_SOCKET")
+    if socket_path:
+        client = redis.StrictRedis(
+            unix_socket_path=socket_path, db=REDIS_DB, decode_responses=True,
+            health_check_interval=REDIS_HEALTH_CHECK_SEC
+        )
+    else:
+        client = redis.StrictRedis(
+            host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True,
+            health_check_interval=REDIS_HEALTH_CHECK_SEC
+        )
     try:
         client.ping()
         return client, False
@@ -150,27 +365,44 @@ def _init_redis_client():
 
 redis_client, IS_FAKE_REDIS = _init_redis_client()
 
+CLEAR_BATCH = 500
+# 记录本程序写入过的键（set），清理时直接按集合删除，无需扫描整个 keyspace
+APP_KEYSET = "app:keyset"
+# 合约精度信息缓存（带 TTL），启动清理时保留
+EXCHANGE_FILTERS_KEY = "binance:symbol_filters"
+
 
 def clear_redis():
     keep = {
         "deepseek_analysis_request_history",
         "deepseek_analysis_response_history",
-        "trading_records"
+        "trading_records",
+        EXCHANGE_FILTERS_KEY,
     }
 
+    deleted = 0
     try:
-        keys = redis_client.keys("*")
+        tracked = redis_client.smembers(APP_KEYSET)
+        if tracked:
+            targets = iter(tracked - keep)
+        else:
+            # 尚无键登记（首次运行 / 旧版本数据）→ SCAN 分批遍历
+            targets = (k for k in redis_client.scan_iter(match="*", count=CLEAR_BATCH) if k not in keep)
+
+        # 管道批量 UNLINK：键在 Redis 后台线程释放内存，大键（长历史 K 线）不会阻塞服务端
+        # 每批 CLEAR_BATCH 个键提交一次，客户端内存与单次请求大小都有上限
+        pipe = redis_client.pipeline(transaction=False)
+        while True:
+            batch = list(itertools.islice(targets, CLEAR_BATCH))
+            if not batch:
+                break
+            pipe.unlink(*batch)
+            pipe.execute()
+            deleted += len(batch)
+        pipe.unlink(APP_KEYSET)
+        pipe.execute()
     except Exception as e:
         print(f"Redis 不可用，跳过清理（{e}）")
         return
 
-    deleted = 0
-    for key in keys:
-        if key not in keep:
-            try:
-                redis_client.delete(key)
-                deleted += 1
-            except Exception:
-                continue
-
     print(f"Redis 清理完成 — 删除 {deleted} 个键，保留历史记录")
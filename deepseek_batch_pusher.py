@@ -1,29 +1,44 @@
+import orjson
 import json
 import aiohttp
 import asyncio
+import hashlib
+import io
 import logging
+import operator
+import os
 import time
 import re
-from concurrent.futures import ThreadPoolExecutor
 from config import DEEPSEEK_API_KEY, DEEPSEEK_MODEL, DEEPSEEK_URL, OPEN_WHITELIST, MIN_QUOTE_VOLUME_USDT
 from database import redis_client
 from volume_stats import (
-    calc_volume_compare, get_open_interest, get_funding_rate, get_24hr_change, calc_smart_sentiment,
-    get_oi_history, get_top_position_ratio, get_top_account_ratio, get_global_account_ratio)
+    calc_volume_compare_values, load_klines_many, calc_smart_sentiment_async,
+    get_open_interest_async, get_funding_rate_async, get_24hr_change_async, get_oi_history_async,
+    get_top_position_ratio_async, get_top_account_ratio_async, get_global_account_ratio_async,
+    refresh_market_snapshot_async)
 from account_positions import account_snapshot, tp_sl_cache
 
 KEY_REQ = "deepseek_analysis_request_history"
 KEY_RES = "deepseek_analysis_response_history"
 
+# DeepSeek 结果短期缓存：相同提示词 + 相同行情快照直接复用上次结果
+DS_CACHE_PREFIX = "ds_sig:"
+DS_CACHE_TTL = 60
+NON_TRADE_ACTIONS = {"hold", "wait"}
+
 # 批量缓存
 batch_cache = {}
 required_intervals = ["1d", "4h", "1h", "15m", "5m"]
 
+# 投喂给 AI 的 K 线数组字段（入队时一次性转成按列存储）
+SERIES_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+_series_getter = operator.itemgetter(*SERIES_FIELDS)
+
 # 添加到 batch
 def add_to_batch(symbol, interval, klines, indicators):
-    if symbol not in batch_cache:
-        batch_cache[symbol] = {}
-    batch_cache[symbol][interval] = {"klines": klines, "indicators": indicators}
+    series = dict(zip(SERIES_FIELDS, map(list, zip(*map(_series_getter, klines)))))
+    # setdefault 是原子操作：同一币种的多个周期可能由不同线程同时写入
+    batch_cache.setdefault(symbol, {})[interval] = {"klines": klines, "series": series, "indicators": indicators}
 
 # 判断是否可以推送
 def _is_ready_for_push():
@@ -45,23 +60,36 @@ def sentiment_to_signal(score):
         return "🟡 恐慌缓解"
     return "🔥 极度恐慌"
 
+PROMPT_FILE = "prompt.txt"
+DEFAULT_PROMPT = "你是一名专业量化策略分析引擎，请严格输出 JSON 数组或 JSON 对象形式的交易信号。"
+
+# prompt.txt 按 mtime 缓存，文件未改动时不重复读盘
+_prompt_cache = {"mtime": None, "text": None}
+
 def _read_prompt():
     """
     读取 prompt.txt 内容作为系统提示。
     如果文件不存在，则返回默认提示。
     """
     try:
-        with open("prompt.txt", "r", encoding="utf-8") as f:
+        mtime = os.stat(PROMPT_FILE).st_mtime
+        if mtime == _prompt_cache["mtime"]:
+            return _prompt_cache["text"]
+        with open(PROMPT_FILE, "r", encoding="utf-8") as f:
             text = f.read()
             whitelist = ", ".join([s for s in OPEN_WHITELIST if isinstance(s, str) and s.strip()])
             text = text.replace("{{OPEN_WHITELIST}}", whitelist or "（空）")
             text = text.replace("{{MIN_QUOTE_VOLUME_USDT}}", str(MIN_QUOTE_VOLUME_USDT))
-            return text
+        _prompt_cache["mtime"] = mtime
+        _prompt_cache["text"] = text
+        return text
     except Exception:
-        return "你是一名专业量化策略分析引擎，请严格输出 JSON 数组或 JSON 对象形式的交易信号。"
+        return DEFAULT_PROMPT
+
+PRELOAD_CONCURRENCY = 32
 
 ###############################################
-# 🔥 集中预拉取所有 API（线程池 + 异常安全）
+# 🔥 集中预拉取所有 API（单 aiohttp session 并发 + 异常安全）
 ###############################################
 async def preload_all_api(dataset):
     results = {
@@ -75,56 +103,67 @@ async def preload_all_api(dataset):
         "global_acc": {},
     }
 
-    def safe_call(func, *args, **kwargs):
-        try:
-            return func(*args, **kwargs)
-        except:
-            return None
-
-    loop = asyncio.get_running_loop()
-    executor = ThreadPoolExecutor(max_workers=20)
-
-    tasks = []
-    for symbol, cycles in dataset.items():
-        # 单 symbol
-        tasks.append(loop.run_in_executor(executor, safe_call, get_funding_rate, symbol))
-        tasks.append(loop.run_in_executor(executor, safe_call, get_24hr_change, symbol))
-        tasks.append(loop.run_in_executor(executor, safe_call, get_open_interest, symbol))
-
-        for interval in cycles.keys():
-            key = f"{symbol}:{interval}"
-            tasks.append(loop.run_in_executor(executor, safe_call, get_oi_history, symbol, interval, 10))
-            tasks.append(loop.run_in_executor(executor, safe_call, get_top_position_ratio, symbol, interval, 1))
-            tasks.append(loop.run_in_executor(executor, safe_call, get_top_account_ratio, symbol, interval, 1))
-            tasks.append(loop.run_in_executor(executor, safe_call, get_global_account_ratio, symbol, interval, 1))
-            tasks.append(loop.run_in_executor(executor, safe_call, calc_smart_sentiment, symbol, interval))
-
-    # 执行任务
-    completed = await asyncio.gather(*tasks)
-
-    # 按顺序填充结果
-    idx = 0
-    for symbol, cycles in dataset.items():
-        results["funding"][symbol] = completed[idx]; idx += 1
-        results["p24"][symbol] = completed[idx]; idx += 1
-        results["oi"][symbol] = completed[idx]; idx += 1
-        for interval in cycles.keys():
-            key = f"{symbol}:{interval}"
-            results["oi_hist"][key] = completed[idx]; idx += 1
-            results["big_pos"][key] = completed[idx]; idx += 1
-            results["big_acc"][key] = completed[idx]; idx += 1
-            results["global_acc"][key] = completed[idx]; idx += 1
-            results["sentiment"][key] = completed[idx]; idx += 1
+    # 限制同时在途的请求数，避免币种 × 周期较多时瞬间打满 Binance 限频
+    sem = asyncio.Semaphore(PRELOAD_CONCURRENCY)
+
+    async def safe_call(coro):
+        async with sem:
+            try:
+                return await coro
+            except Exception:
+                return None
+
+    # 情绪评分所需 K 线：一次 Redis pipeline 批量读取（同步 Redis 调用，放到线程里执行，不阻塞事件循环）
+    pairs = [(symbol, interval) for symbol, cycles in dataset.items() for interval in cycles]
+    klines = await asyncio.to_thread(load_klines_many, pairs)
+
+    connector = aiohttp.TCPConnector(limit=100, limit_per_host=50)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # 资金费率 / 24h 行情走全市场接口各请求一次，逐币种调用直接命中缓存
+        await refresh_market_snapshot_async(session)
+
+        async def load_symbol(symbol, cycles):
+            # 单 symbol（顺带预热情绪评分复用的 1h OI 历史）
+            fr, p24, oi_now, _ = await asyncio.gather(
+                safe_call(get_funding_rate_async(session, symbol)),
+                safe_call(get_24hr_change_async(session, symbol)),
+                safe_call(get_open_interest_async(session, symbol)),
+                safe_call(get_oi_history_async(session, symbol, "1h", 10)),
+            )
+            results["funding"][symbol] = fr
+            results["p24"][symbol] = p24
+            results["oi"][symbol] = oi_now
+
+            async def load_interval(interval):
+                key = f"{symbol}:{interval}"
+                (results["oi_hist"][key], results["big_pos"][key], results["big_acc"][key],
+                 results["global_acc"][key], results["sentiment"][key]) = await asyncio.gather(
+                    safe_call(get_oi_history_async(session, symbol, interval, 10)),
+                    safe_call(get_top_position_ratio_async(session, symbol, interval, 1)),
+                    safe_call(get_top_account_ratio_async(session, symbol, interval, 1)),
+                    safe_call(get_global_account_ratio_async(session, symbol, interval, 1)),
+                    safe_call(calc_smart_sentiment_async(session, symbol, interval, klines[(symbol, interval)])),
+                )
+
+            await asyncio.gather(*(load_interval(interval) for interval in cycles))
+
+        await asyncio.gather(*(load_symbol(symbol, cycles) for symbol, cycles in dataset.items()))
 
     return results
 
+_DECISION_RE = re.compile(r"<decision>([\s\S]*?)</decision>", re.I)
+_json_decoder = json.JSONDecoder()
+
 def _extract_decision_block(content: str):
-    match = re.search(r"<decision>([\s\S]*?)</decision>", content, flags=re.I)
+    match = _DECISION_RE.search(content)
     if not match:
         return None
     block = match.group(1).strip()
+    # 只接受数组；不是 [...] 形态的就不必尝试解析
+    if not (block.startswith("[") and block.endswith("]")):
+        return None
     try:
-        parsed = json.loads(block)
+        parsed = orjson.loads(block)
         if isinstance(parsed, list):
             return parsed
     except:
@@ -133,21 +172,32 @@ def _extract_decision_block(content: str):
 
 def _extract_all_json(content: str):
     results = []
-    try:
-        parsed = json.loads(content)
-        if isinstance(parsed, list):
-            return [x for x in parsed if isinstance(x, dict) and "action" in x]
-    except:
-        pass
+    if "action" not in content:
+        return None
 
-    matches = re.findall(r'\{[^{}]*\}', content, flags=re.S)
-    for m in matches:
+    stripped = content.strip()
+    if stripped.startswith("[") and stripped.endswith("]"):
         try:
-            obj = json.loads(m)
-            if isinstance(obj, dict) and "action" in obj:
-                results.append(obj)
+            parsed = orjson.loads(stripped)
+            if isinstance(parsed, list):
+                return [x for x in parsed if isinstance(x, dict) and "action" in x]
         except:
             pass
+
+    # 线性扫描：从每个 "{" 起用 raw_decode 解析，支持嵌套对象
+    i = content.find("{")
+    while i != -1:
+        try:
+            obj, end = _json_decoder.raw_decode(content, i)
+        except ValueError:
+            i = content.find("{", i + 1)
+            continue
+        if isinstance(obj, dict) and "action" in obj:
+            results.append(obj)
+            i = content.find("{", end)
+        else:
+            # 外层对象不是信号，继续在其内部查找
+            i = content.find("{", i + 1)
     return results if results else None
     
 ###############################################
@@ -155,18 +205,18 @@ def _extract_all_json(content: str):
 ###############################################
 def _format_dataset(dataset, preloaded):
     start_time = time.time()
-    text = []
-    append = text.append
+    buf = io.StringIO()
+    w = buf.write
 
     # ===== 账户资金 & 持仓 =====
     account = account_snapshot
-    append("========= 📌 当前账户资金状态 =========")
-    append(f"💰 总权益 Balance: {round(account['balance'], 4)}")
-    append(f"🔓 可用余额 Available: {round(account['available'], 4)}")
-    append(f"📉 总未实现盈亏 PnL: {round(account['total_unrealized'], 4)}")
+    w("========= 📌 当前账户资金状态 =========\n")
+    w(f"💰 总权益 Balance: {round(account['balance'], 4)}\n")
+    w(f"🔓 可用余额 Available: {round(account['available'], 4)}\n")
+    w(f"📉 总未实现盈亏 PnL: {round(account['total_unrealized'], 4)}\n")
 
     if account["positions"]:
-        append("\n📌 当前持仓:")
+        w("\n📌 当前持仓:\n")
         for p in account["positions"]:
             amt = float(p["size"])
             entry = float(p["entry"])
@@ -184,29 +234,30 @@ def _format_dataset(dataset, preloaded):
                 line += " | TP/SL: " + ", ".join(tp_sl_lines)
             else:
                 line += " | TP/SL: 无"
-            append(line)
+            w(line)
+            w("\n")
     else:
-        append("\n📌 当前无持仓")
+        w("\n📌 当前无持仓\n")
 
     # ===== 多周期循环 =====
     for symbol, cycles in dataset.items():
-        append(f"\n============ {symbol} 多周期行情快照 ============")
+        w(f"\n============ {symbol} 多周期行情快照 ============\n")
         fr     = preloaded["funding"].get(symbol)
         p24    = preloaded["p24"].get(symbol)
         oi_now = preloaded["oi"].get(symbol)
 
         if p24:
-            append(f"• 24h 涨跌幅: {p24['priceChangePercent']}% → 最新 {p24['lastPrice']} (高 {p24['highPrice']} / 低 {p24['lowPrice']})")
-            append(f"• 24h 成交额: {round(p24['quoteVolume']/1e6, 2)}M USD")
+            w(f"• 24h 涨跌幅: {p24['priceChangePercent']}% → 最新 {p24['lastPrice']} (高 {p24['highPrice']} / 低 {p24['lowPrice']})\n")
+            w(f"• 24h 成交额: {round(p24['quoteVolume']/1e6, 2)}M USD\n")
 
-        append(f"💰 当前资金费率 Funding Rate: {fr if fr is not None else '未知'}")
+        w(f"💰 当前资金费率 Funding Rate: {fr if fr is not None else '未知'}\n")
 
         for interval, data in cycles.items():
             kl = data["klines"]
             ind = data["indicators"]
             last = kl[-1]
-            append(f"\n--- {interval} ---")
-            append(f"📌 当前周期收盘价格: {last['Close']}")
+            w(f"\n--- {interval} ---\n")
+            w(f"📌 当前周期收盘价格: {last['Close']}\n")
             key = f"{symbol}:{interval}"
 
             oi_hist    = preloaded["oi_hist"].get(key)
@@ -215,96 +266,127 @@ def _format_dataset(dataset, preloaded):
             global_acc = preloaded["global_acc"].get(key)
             sentiment  = preloaded["sentiment"].get(key)
 
-            append(f"🧱 当前永续未平仓量 OI: {oi_now if oi_now is not None else '未知'}")
+            w(f"🧱 当前永续未平仓量 OI: {oi_now if oi_now is not None else '未知'}\n")
 
             if oi_hist:
-                arr = [round(i["openInterest"], 2) for i in oi_hist][-10:]
-                append(f"•最新10条历史 OI 数据趋势: {arr}")
+                arr = [round(i["openInterest"], 2) for i in oi_hist[-10:]]
+                w(f"•最新10条历史 OI 数据趋势: {arr}\n")
 
             if big_pos:
                 b = big_pos[-1]
-                append(f"• 大户持仓量多空比: {b['ratio']} (多 {b['long']}, 空 {b['short']})")
+                w(f"• 大户持仓量多空比: {b['ratio']} (多 {b['long']}, 空 {b['short']})\n")
             if big_acc:
                 b = big_acc[-1]
-                append(f"• 大户账户数多空比: {b['ratio']} (多 {b['long']}, 空 {b['short']})")
+                w(f"• 大户账户数多空比: {b['ratio']} (多 {b['long']}, 空 {b['short']})\n")
             if global_acc:
                 g = global_acc[-1]
-                append(f"• 全网多空人数比: {g['ratio']} (多 {g['long']}, 空 {g['short']})")
+                w(f"• 全网多空人数比: {g['ratio']} (多 {g['long']}, 空 {g['short']})\n")
 
-            append("\n📌 CVD 指标:")
+            w("\n📌 CVD 指标:\n")
             for keycv in ["CVD", "CVD_MOM", "CVD_DIVERGENCE", "CVD_PEAKFLIP", "CVD_NORM"]:
                 if keycv in ind:
-                    append(f"{keycv}: {ind[keycv]}")
+                    w(f"{keycv}: {ind[keycv]}\n")
 
             if sentiment:
                 try:
                     score = sentiment["sentiment_score"]
                     fac = sentiment["factors"]
-                    append("\n📌 Smart Sentiment Score:")
-                    append(f"🎯 情绪评分: {score}/100")
-                    append("📊 分项因子(归一化):")
-                    append(f"· OI情绪: {fac['open_interest']}")
-                    append(f"· Funding情绪: {fac['funding_rate']}")
-                    append(f"· 大户情绪: {fac['big_whales']}")
-                    append(f"· 散户反向情绪: {fac['retail_inverse']}")
-                    append(f"· 成交量情绪: {fac['volume_emotion']}")
+                    w("\n📌 Smart Sentiment Score:\n")
+                    w(f"🎯 情绪评分: {score}/100\n")
+                    w("📊 分项因子(归一化):\n")
+                    w(f"· OI情绪: {fac['open_interest']}\n")
+                    w(f"· Funding情绪: {fac['funding_rate']}\n")
+                    w(f"· 大户情绪: {fac['big_whales']}\n")
+                    w(f"· 散户反向情绪: {fac['retail_inverse']}\n")
+                    w(f"· 成交量情绪: {fac['volume_emotion']}\n")
                 except Exception:
-                    append("\n📌 Smart Sentiment Score: 计算失败")
+                    w("\n📌 Smart Sentiment Score: 计算失败\n")
             else:
-                append("\n📌 Smart Sentiment Score: 计算失败")
+                w("\n📌 Smart Sentiment Score: 计算失败\n")
 
-            append("\n📌 波动率指标:")
+            w("\n📌 波动率指标:\n")
             if "ATR" in ind:
-                append(f"ATR: {ind['ATR']:.6f}")
+                w(f"ATR: {ind['ATR']:.6f}\n")
             if "ATR_MA20" in ind:
-                append(f"ATR 20周期均值: {ind['ATR_MA20']:.6f}")
+                w(f"ATR 20周期均值: {ind['ATR_MA20']:.6f}\n")
 
             last_buy  = float(last["TakerBuyVolume"])
             last_sell = float(last["TakerSellVolume"])
             last_vol  = float(last["Volume"])
             ratio     = round(last_buy / last_vol * 100, 2) if last_vol > 0 else 0
 
-            append("\n📌 主动交易量:")
-            append(f"主动买入量(Taker Buy): {last_buy}")
-            append(f"主动卖出量(Taker Sell): {last_sell}")
-            append(f"主动买入占比: {ratio}%")
+            w("\n📌 主动交易量:\n")
+            w(f"主动买入量(Taker Buy): {last_buy}\n")
+            w(f"主动卖出量(Taker Sell): {last_sell}\n")
+            w(f"主动买入占比: {ratio}%\n")
 
-            vol_info = calc_volume_compare(kl)
+            series = data["series"]
+            vol_info = calc_volume_compare_values(series["Volume"])
             if vol_info:
-                append("\n📌 成交量对比:")
-                append(f"当前成交量: {vol_info['current_volume']}")
-                append(f"100根均量: {vol_info['average_volume_100']}")
-                append(f"当前/均量比值: {vol_info['ratio']}")
-
-            opens   = [k["Open"] for k in kl]
-            highs   = [k["High"] for k in kl]
-            lows    = [k["Low"] for k in kl]
-            closes  = [k["Close"] for k in kl]
-            volumes = [k["Volume"] for k in kl]
-            append("\n📌 K线数组格式从旧 → 新:")
-            append(f"open: {opens}")
-            append(f"high: {highs}")
-            append(f"low: {lows}")
-            append(f"close: {closes}")
-            append(f"volume: {volumes}")
-
-    # append("\n🧠 现在请分析并输出决策（简洁思维链 < 150 字 + JSON）")
+                w("\n📌 成交量对比:\n")
+                w(f"当前成交量: {vol_info['current_volume']}\n")
+                w(f"100根均量: {vol_info['average_volume_100']}\n")
+                w(f"当前/均量比值: {vol_info['ratio']}\n")
+
+            w("\n📌 K线数组格式从旧 → 新:\n")
+            w(f"open: {series['Open']}\n")
+            w(f"high: {series['High']}\n")
+            w(f"low: {series['Low']}\n")
+            w(f"close: {series['Close']}\n")
+            w(f"volume: {series['Volume']}\n")
+
+    # w("\n🧠 现在请分析并输出决策（简洁思维链 < 150 字 + JSON）\n")
     #调试完毕后可以不输出思维链,节约token
-    append("\n🧠 请直接输出交易决策，不需要推理过程，只需JSON格式：")
-    append("指令：只输出<decision>标签内的JSON数组，不要任何解释文字。")
+    w("\n🧠 请直接输出交易决策，不需要推理过程，只需JSON格式：\n")
+    w("指令：只输出<decision>标签内的JSON数组，不要任何解释文字。")
     end_time = time.time()
     print(f"[_format_dataset] 函数执行耗时: {end_time - start_time:.3f} 秒")
-    return "\n".join(text)
+    return buf.getvalue()
+
+_ds_session = None
+
+
+async def _get_session():
+    """复用同一个 ClientSession，保持与 DeepSeek 的长连接"""
+    global _ds_session
+    if _ds_session is None or _ds_session.closed:
+        _ds_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=120),
+        )
+    return _ds_session
+
+
+async def close_session():
+    global _ds_session
+    if _ds_session is not None and not _ds_session.closed:
+        await _ds_session.close()
+    _ds_session = None
+
+
+def _ds_cache_key(system_prompt, formatted_dataset):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(system_prompt.encode("utf-8"))
+    h.update(b"\0")
+    h.update(formatted_dataset.encode("utf-8"))
+    return DS_CACHE_PREFIX + h.hexdigest()
+
+def _is_cacheable(signals):
+    """只缓存 hold/wait 类结果，任何交易动作都必须重新请求 AI"""
+    return bool(signals) and all(
+        isinstance(s, dict) and s.get("action") in NON_TRADE_ACTIONS for s in signals
+    )
 
 ###############################################
 # 🔥 DeepSeek 投喂
 ###############################################
 async def push_batch_to_deepseek():
+    global batch_cache
     if not _is_ready_for_push():
         return None
 
-    dataset = batch_cache.copy()
-    batch_cache.clear()
+    # 直接换绑新字典：旧字典整体归本次推送所有，无需复制
+    dataset, batch_cache = batch_cache, {}
     timestamp = int(time.time() * 1000)
     loop = asyncio.get_running_loop()
 
@@ -313,7 +395,7 @@ async def push_batch_to_deepseek():
     print("📌 预加载完成 ✓")
 
     formatted_dataset = await loop.run_in_executor(None, _format_dataset, dataset, preloaded)
-    system_prompt = await loop.run_in_executor(None, _read_prompt)
+    system_prompt = _read_prompt()
 
     # 兼容阿里千问 DashScope 的兼容模式（OpenAI 接口路径 /chat/completions）
     endpoint = DEEPSEEK_URL.rstrip("/")
@@ -331,44 +413,69 @@ async def push_batch_to_deepseek():
         "stream": False
     }
 
-    redis_client.lpush(KEY_REQ, json.dumps({
+    redis_client.lpush(KEY_REQ, orjson.dumps({
         "timestamp": timestamp,
         "request": formatted_dataset
-    }, ensure_ascii=False))
+    }))
+
+    cache_key = _ds_cache_key(system_prompt, formatted_dataset)
+    try:
+        cached = redis_client.get(cache_key)
+    except Exception:
+        cached = None
+    if cached:
+        hit = orjson.loads(cached)
+        redis_client.lpush(KEY_RES, orjson.dumps({
+            "timestamp": timestamp,
+            "response_raw": hit["raw"],
+            "response_json": hit["signals"],
+            "status_code": hit["status_code"],
+            "cost_ms": 0,
+            "cached": True
+        }))
+        print("♻ 行情快照未变化，复用 DeepSeek 缓存结果")
+        return hit["signals"]
 
     start = time.perf_counter()
     print("⏳ 正在请求 DeepSeek…")
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(endpoint, json=payload,
-                                    headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}"}) as resp:
-                raw = await resp.text()
-                cost = round((time.perf_counter() - start) * 1000, 2)
-                print(f"DeepSeek 已返回 | 耗时 {cost} ms")
-
-                def parse_ai_response(raw):
-                    try:
-                        root = json.loads(raw)
-                        content = root["choices"][0]["message"]["content"]
-                    except:
-                        return None
-                    d = _extract_decision_block(content)
-                    if d: return d
-                    return _extract_all_json(content)
-
-                signals = await loop.run_in_executor(None, parse_ai_response, raw)
-
-                redis_client.lpush(KEY_RES, json.dumps({
-                    "timestamp": timestamp,
-                    "response_raw": raw,
-                    "response_json": signals,
-                    "status_code": resp.status,
-                    "cost_ms": cost
-                }, ensure_ascii=False))
-
-                print(f"⏱ DeepSeek 响应耗时: {cost} ms   HTTP: {resp.status}")
-                return signals
+        session = await _get_session()
+        async with session.post(endpoint, json=payload,
+                                headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}"}) as resp:
+            raw = await resp.text()
+            cost = round((time.perf_counter() - start) * 1000, 2)
+            print(f"DeepSeek 已返回 | 耗时 {cost} ms")
+
+            def parse_ai_response(raw):
+                try:
+                    root = orjson.loads(raw)
+                    content = root["choices"][0]["message"]["content"]
+                except:
+                    return None
+                d = _extract_decision_block(content)
+                if d: return d
+                return _extract_all_json(content)
+
+            signals = await loop.run_in_executor(None, parse_ai_response, raw)
+
+            redis_client.lpush(KEY_RES, orjson.dumps({
+                "timestamp": timestamp,
+                "response_raw": raw,
+                "response_json": signals,
+                "status_code": resp.status,
+                "cost_ms": cost
+            }))
+
+            if resp.status == 200 and _is_cacheable(signals):
+                redis_client.set(cache_key, orjson.dumps({
+                    "raw": raw,
+                    "signals": signals,
+                    "status_code": resp.status
+                }), ex=DS_CACHE_TTL)
+
+            print(f"⏱ DeepSeek 响应耗时: {cost} ms   HTTP: {resp.status}")
+            return signals
 
     except Exception as e:
         logging.error(f"❌ DeepSeek 调用失败：{e}")
@@ -1,27 +1,46 @@
+import atexit
+from collections import deque
+from itertools import islice
 import os
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import unicodedata
-from decimal import Decimal, ROUND_CEILING, ROUND_DOWN, ROUND_FLOOR, getcontext
-from typing import Dict, List, Optional, Set, Tuple
+from decimal import Decimal, getcontext
+from typing import Deque, Dict, List, Optional, Set, TextIO, Tuple
 
+import numpy as np
+import orjson
 from binance.client import Client
-from binance.exceptions import BinanceAPIException
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from cachetools import TTLCache
+
+from tick_math import snap_units
+
+
+class _OrjsonClient(Client):
+    """只在本模块创建的 Client 上用 orjson 解析 REST 响应，不改动全局 requests。"""
+
+    @staticmethod
+    def _handle_response(response):
+        if not (200 <= response.status_code < 300):
+            raise BinanceAPIException(response, response.status_code, response.text)
+        if not response.content:
+            return {}
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            raise BinanceRequestException("Invalid Response: %s" % response.text)
 
 
 SL_ORDER_TYPES = {"STOP", "STOP_MARKET"}
 
 getcontext().prec = 28
 
-_symbol_price_filter_cache: Dict[str, Decimal] = {}
-_last_sl_update_at: Dict[Tuple[str, str], float] = {}
-_sl_snapshot_cache: Dict[Tuple[str, str], Tuple[float, int, float]] = {}
-_last_rate_limit_notice_ts: float = 0.0
-_rate_limit_backoff_sec: float = 0.0
-_sl_action_history: List[str] = []
-
 DEFAULT_INTERVAL_SEC = 1.0
 DEFAULT_CLEAR_SCREEN = True
 DEFAULT_SL_ENABLED = True
@@ -35,6 +54,19 @@ DEFAULT_SL_LOG_LINES = 30
 DEFAULT_SL_LOG_FILE = ""
 DEFAULT_SL_LOG_KEEP = 200
 
+CACHE_MAXSIZE = 4096
+TICK_SIZE_TTL_SEC = 3600
+
+# TTLCache 自动过期，长时间运行也不会无限增长
+_symbol_price_filter_cache: "TTLCache[str, Tuple[Decimal, int, int, int]]" = TTLCache(maxsize=CACHE_MAXSIZE, ttl=TICK_SIZE_TTL_SEC)
+_last_sl_update_at: "TTLCache[Tuple[str, str], float]" = TTLCache(maxsize=CACHE_MAXSIZE, ttl=DEFAULT_SL_MIN_INTERVAL_SEC)
+_sl_snapshot_cache: "TTLCache[Tuple[str, str], Tuple[float, int]]" = TTLCache(maxsize=CACHE_MAXSIZE, ttl=DEFAULT_SL_REFRESH_SEC)
+_last_rate_limit_notice_ts: float = 0.0
+_rate_limit_backoff_sec: float = 0.0
+_sl_action_history: Deque[str] = deque(maxlen=DEFAULT_SL_LOG_KEEP)
+_sl_log_fp: Optional[TextIO] = None
+_sl_log_path: str = ""
+
 
 def _load_keys():
     api_key = os.environ.get("BINANCE_API_KEY")
@@ -55,15 +87,84 @@ def _load_keys():
     )
 
 
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="binance")
+
+ACCOUNT_WIDE_ORDERS_WEIGHT = 40
+
+# Binance 期货接口权重：(带 symbol, 不带 symbol)
+_ENDPOINT_WEIGHTS: Dict[str, Tuple[int, int]] = {
+    "futures_account": (5, 5),
+    "futures_get_open_orders": (1, ACCOUNT_WIDE_ORDERS_WEIGHT),
+    "futures_mark_price": (1, 10),
+    "futures_exchange_info": (1, 1),
+    "futures_create_order": (1, 1),
+    "futures_cancel_order": (1, 1),
+    "futures_cancel_algo_order": (1, 1),
+}
+
+
+class _TokenBucket:
+    """令牌桶：请求前先扣权重，不足时阻塞等待补充，避免突发请求触发 -1003。"""
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self._lock = threading.Lock()
+        self.capacity = float(capacity)
+        self.refill_per_sec = float(refill_per_sec)
+        self.tokens = float(capacity)
+        self.ts = time.monotonic()
+
+    def take(self, weight: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.refill_per_sec)
+            self.ts = now
+            if self.tokens >= weight:
+                self.tokens -= weight
+                return
+            time.sleep((weight - self.tokens) / self.refill_per_sec)
+            self.tokens = 0.0
+            self.ts = time.monotonic()
+
+    def drain(self) -> None:
+        with self._lock:
+            self.tokens = 0.0
+            self.ts = time.monotonic()
+
+
+class _RateLimitedClient:
+    """Client 代理：所有 futures_* 调用先经过令牌桶。"""
+
+    def __init__(self, client: Client, bucket: _TokenBucket):
+        self._client = client
+        self.bucket = bucket
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not name.startswith("futures_") or not callable(attr):
+            return attr
+
+        with_symbol, without_symbol = _ENDPOINT_WEIGHTS.get(name, (1, 1))
+
+        def call(*args, **kwargs):
+            self.bucket.take(with_symbol if kwargs.get("symbol") else without_symbol)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+RATE_LIMIT_CAPACITY = 1200
+RATE_LIMIT_REFILL_PER_SEC = 20.0
+
+
 def _build_client():
     api_key, api_secret = _load_keys()
-    client = Client(
+    client = _OrjsonClient(
         api_key=api_key,
         api_secret=api_secret,
         requests_params={"timeout": 20},
     )
     client.recvWindow = 10000
-    return client
+    return _RateLimitedClient(client, _TokenBucket(RATE_LIMIT_CAPACITY, RATE_LIMIT_REFILL_PER_SEC))
 
 
 def _safe_float(value, default: float = 0.0) -> float:
@@ -73,13 +174,34 @@ def _safe_float(value, default: float = 0.0) -> float:
         return default
 
 
+def _abs_qty_str(value) -> str:
+    """positionAmt 字符串 → 去符号、去末尾 0 的数量文本（"-0.010" → "0.01"），仅异常格式才走 Decimal。"""
+    s = str(value or "0").strip().lstrip("+-")
+    if s.replace(".", "", 1).isdigit():
+        if "." in s:
+            s = s.rstrip("0").rstrip(".")
+        s = s.lstrip("0") or "0"
+        return "0" + s if s[0] == "." else s
+    try:
+        return format(abs(Decimal(s)).normalize(), "f")
+    except Exception:
+        return "0"
+
+
+@lru_cache(maxsize=4096)
+def _char_width(ch: str) -> int:
+    if ord(ch) < 0x80:
+        return 1
+    if unicodedata.combining(ch):
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+
+
 def _display_width(text: str) -> int:
-    width = 0
-    for ch in str(text):
-        if unicodedata.combining(ch):
-            continue
-        width += 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
-    return width
+    text = str(text)
+    if text.isascii():
+        return len(text)
+    return sum(map(_char_width, text))
 
 
 def _truncate_to_width(text: str, width: int) -> str:
@@ -91,10 +213,10 @@ def _truncate_to_width(text: str, width: int) -> str:
     out: List[str] = []
     used = 0
     for ch in text:
-        if unicodedata.combining(ch):
+        w = _char_width(ch)
+        if w == 0:
             out.append(ch)
             continue
-        w = 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
         if used + w > width:
             break
         out.append(ch)
@@ -102,8 +224,17 @@ def _truncate_to_width(text: str, width: int) -> str:
     return "".join(out)
 
 
+_ALIGN_SPEC = {"left": "<", "right": ">", "center": "^"}
+
+
 def _pad(text: str, width: int, align: str) -> str:
-    text = _truncate_to_width(str(text), width)
+    text = str(text)
+    if text.isascii():
+        # 纯 ASCII（数字/合约名）显示宽度即长度，直接交给 str.format 对齐
+        if width <= 0:
+            return ""
+        return f"{text[:width]:{_ALIGN_SPEC.get(align, '<')}{width}}"
+    text = _truncate_to_width(text, width)
     pad_len = max(0, width - _display_width(text))
     if align == "right":
         return (" " * pad_len) + text
@@ -114,62 +245,72 @@ def _pad(text: str, width: int, align: str) -> str:
     return text + (" " * pad_len)
 
 
-def _get_tick_size(client: Client, symbol: str) -> float:
-    tick = _symbol_price_filter_cache.get(symbol)
-    if tick is not None:
-        return float(tick)
+def _tick_entry(tick_str: str) -> Tuple[Decimal, int, int, int]:
+    """tickSize → (tick, tick_units, scale, decimals)，满足 tick == tick_units / scale。"""
+    tick = Decimal(tick_str)
+    decimals = max(0, -tick.as_tuple().exponent)
+    scale = 10 ** decimals
+    return tick, int(tick * scale), scale, decimals
+
+
+DEFAULT_TICK_ENTRY = _tick_entry("0.01")
+
 
+def _prime_tick_size_cache(client: Client) -> None:
+    """一次 exchange_info 写入全部合约的 tickSize。"""
     info = client.futures_exchange_info()
     for s in info.get("symbols", []):
-        if s.get("symbol") != symbol:
+        symbol = s.get("symbol")
+        if not symbol:
             continue
         for f in s.get("filters", []):
             if f.get("filterType") == "PRICE_FILTER":
-                tick_str = str(f.get("tickSize") or "0.01")
-                tick_dec = Decimal(tick_str)
-                _symbol_price_filter_cache[symbol] = tick_dec
-                return float(tick_dec)
+                _symbol_price_filter_cache[symbol] = _tick_entry(str(f.get("tickSize") or "0.01"))
+                break
+
+
+def _get_tick_entry(client: Client, symbol: str) -> Tuple[Decimal, int, int, int]:
+    entry = _symbol_price_filter_cache.get(symbol)
+    if entry is not None:
+        return entry
+
+    _prime_tick_size_cache(client)
+    entry = _symbol_price_filter_cache.get(symbol)
+    if entry is None:
+        entry = DEFAULT_TICK_ENTRY
+        _symbol_price_filter_cache[symbol] = entry
+    return entry
+
+
+def _get_tick_size(client: Client, symbol: str) -> float:
+    return float(_get_tick_entry(client, symbol)[0])
+
 
-    _symbol_price_filter_cache[symbol] = Decimal("0.01")
-    return 0.01
+# 价格按 tick 取整走整数运算（tick_math.snap_units），超出 float 可靠位数的 tick 格式化时退回 Decimal
+TICK_FLOAT_DECIMALS = 12
 
 
 def _normalize_price_floor(client: Client, symbol: str, price: float) -> float:
-    tick = _symbol_price_filter_cache.get(symbol)
-    if tick is None:
-        _get_tick_size(client, symbol)
-        tick = _symbol_price_filter_cache.get(symbol) or Decimal("0.01")
-    if tick <= 0:
+    _, units, scale, _ = _get_tick_entry(client, symbol)
+    if units <= 0:
         return float(price)
-    p = Decimal(str(price))
-    n = (p / tick).to_integral_value(rounding=ROUND_FLOOR)
-    q = (n * tick).quantize(tick, rounding=ROUND_DOWN)
-    return float(q)
+    return snap_units(price, units, scale, False) / scale
 
 
 def _normalize_price_ceil(client: Client, symbol: str, price: float) -> float:
-    tick = _symbol_price_filter_cache.get(symbol)
-    if tick is None:
-        _get_tick_size(client, symbol)
-        tick = _symbol_price_filter_cache.get(symbol) or Decimal("0.01")
-    if tick <= 0:
+    _, units, scale, _ = _get_tick_entry(client, symbol)
+    if units <= 0:
         return float(price)
-    p = Decimal(str(price))
-    n = (p / tick).to_integral_value(rounding=ROUND_CEILING)
-    q = (n * tick).quantize(tick, rounding=ROUND_DOWN)
-    return float(q)
+    return snap_units(price, units, scale, True) / scale
 
 
 def _format_stop_price(client: Client, symbol: str, position_side: str, price: float) -> str:
-    tick = _symbol_price_filter_cache.get(symbol)
-    if tick is None:
-        _get_tick_size(client, symbol)
-        tick = _symbol_price_filter_cache.get(symbol) or Decimal("0.01")
-    rounding = ROUND_FLOOR if position_side == "LONG" else ROUND_CEILING
-    p = Decimal(str(price))
-    n = (p / tick).to_integral_value(rounding=rounding)
-    q = (n * tick).quantize(tick, rounding=ROUND_DOWN)
-    return format(q, "f")
+    tick, units, scale, decimals = _get_tick_entry(client, symbol)
+    q = snap_units(price, units, scale, position_side != "LONG") / scale if units > 0 else float(price)
+    if decimals > TICK_FLOAT_DECIMALS:
+        # 超出 float 可靠位数时退回 Decimal 量化，保证字符串不带尾部噪声
+        return str(Decimal(repr(q)).quantize(tick))
+    return f"{q:.{decimals}f}"
 
 
 def _get_position_side(p: dict, qty: float) -> str:
@@ -180,72 +321,76 @@ def _get_position_side(p: dict, qty: float) -> str:
 
 
 def _fetch_positions_snapshot(client: Client):
-    account = client.futures_account(requests_params={"timeout": 20})
+    account = client.futures_account()
 
-    wallet_balance = float(account.get("totalWalletBalance") or 0)
-    total_unrealized = float(account.get("totalUnrealizedProfit") or 0)
-    available_balance = float(account.get("availableBalance") or 0)
+    _f = _safe_float
+    wallet_balance = _f(account.get("totalWalletBalance"))
+    total_unrealized = _f(account.get("totalUnrealizedProfit"))
+    available_balance = _f(account.get("availableBalance"))
 
     raw_positions: List[dict] = []
+    qty_list: List[float] = []
+    mark_list: List[float] = []
     symbols_need_mark: List[str] = []
     for p in account.get("positions", []):
-        qty = float(p.get("positionAmt") or 0)
+        qty = _f(p.get("positionAmt"))
         if qty == 0:
             continue
         symbol = p.get("symbol") or ""
         if not symbol:
             continue
+        mp = _f(p.get("markPrice"))
         raw_positions.append(p)
-        if _safe_float(p.get("markPrice"), 0.0) <= 0:
+        qty_list.append(qty)
+        mark_list.append(mp)
+        if mp <= 0:
             symbols_need_mark.append(symbol)
 
     mark_dict = _fetch_mark_prices_for_symbols(client, symbols_need_mark) if symbols_need_mark else {}
 
+    # 数值字段按列装入 numpy 数组，名义价值/收益率一次性向量化计算
+    n = len(raw_positions)
+    qty = np.array(qty_list, dtype=np.float64)
+    entry = np.fromiter((_f(p.get("entryPrice")) for p in raw_positions), dtype=np.float64, count=n)
+    mark = np.array(mark_list, dtype=np.float64)
+    pnl = np.fromiter((_f(p.get("unrealizedProfit")) for p in raw_positions), dtype=np.float64, count=n)
+    for i in np.flatnonzero(mark <= 0):
+        mark[i] = float(mark_dict.get(raw_positions[i].get("symbol") or "", entry[i]))
+
+    qty_abs = np.abs(qty)
+    notional = qty_abs * mark
+    denom = qty_abs * entry
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pnl_pct = np.where(denom > 0, pnl / denom * 100.0, 0.0)
+    order = np.argsort(-np.abs(notional), kind="stable")
+
+    qty_l, qty_abs_l, entry_l, mark_l = qty.tolist(), qty_abs.tolist(), entry.tolist(), mark.tolist()
+    notional_l, pnl_l, pnl_pct_l = notional.tolist(), pnl.tolist(), pnl_pct.tolist()
+
     positions = []
-    for p in raw_positions:
-        qty_raw = str(p.get("positionAmt") or "0")
-        try:
-            qty_dec = Decimal(qty_raw)
-        except Exception:
-            qty_dec = Decimal(0)
-        qty = float(qty_dec)
-        symbol = p.get("symbol") or ""
-        entry = float(p.get("entryPrice") or 0)
-        mark = _safe_float(p.get("markPrice"), 0.0)
-        if mark <= 0:
-            mark = float(mark_dict.get(symbol, entry))
-        pnl = float(p.get("unrealizedProfit") or 0)
-        leverage = int(float(p.get("leverage") or 0))
-        position_side = _get_position_side(p, qty)
+    for i in order.tolist():
+        p = raw_positions[i]
+        position_side = _get_position_side(p, qty_l[i])
         side = "做多" if position_side == "LONG" else "做空" if position_side == "SHORT" else position_side
 
-        qty_abs_dec = abs(qty_dec)
-        qty_abs = abs(qty)
-        qty_str = format(qty_abs_dec.normalize(), "f")
-        notional = qty_abs * mark
-        denom = qty_abs * entry
-        pnl_pct = (pnl / denom * 100.0) if denom > 0 else 0.0
-
         positions.append(
             {
-                "symbol": symbol,
+                "symbol": p.get("symbol") or "",
                 "side": side,
                 "position_side": position_side,
-                "qty": qty_abs,
-                "qty_str": qty_str,
-                "entry": entry,
-                "mark": mark,
-                "notional": notional,
-                "pnl": pnl,
-                "pnl_pct": pnl_pct,
-                "leverage": leverage,
+                "qty": qty_abs_l[i],
+                "qty_str": _abs_qty_str(p.get("positionAmt")),
+                "entry": entry_l[i],
+                "mark": mark_l[i],
+                "notional": notional_l[i],
+                "pnl": pnl_l[i],
+                "pnl_pct": pnl_pct_l[i],
+                "leverage": int(_f(p.get("leverage"))),
                 "sl_price": None,
                 "sl_count": 0,
             }
         )
 
-    positions.sort(key=lambda x: abs(x["notional"]), reverse=True)
-
     return {
         "wallet_balance": wallet_balance,
         "available_balance": available_balance,
@@ -255,56 +400,91 @@ def _fetch_positions_snapshot(client: Client):
 
 
 def _clear_screen():
-    os.system("cls" if os.name == "nt" else "clear")
+    # ANSI 光标归位 + 清屏，避免每次刷新 fork 一个 shell
+    sys.stdout.write("\x1b[H\x1b[2J")
+    sys.stdout.flush()
 
 
 def _fetch_open_orders(client: Client) -> List[dict]:
     try:
-        return client.futures_get_open_orders(requests_params={"timeout": 20}) or []
+        return client.futures_get_open_orders() or []
     except Exception:
         return []
 
 
 def _fetch_open_algo_orders(client: Client) -> List[dict]:
     try:
-        return client.futures_get_open_orders(conditional=True, requests_params={"timeout": 20}) or []
+        return client.futures_get_open_orders(conditional=True) or []
     except Exception:
         return []
 
 
 def _fetch_open_orders_by_symbol(client: Client, symbol: str) -> List[dict]:
     try:
-        return client.futures_get_open_orders(symbol=symbol, requests_params={"timeout": 20}) or []
+        return client.futures_get_open_orders(symbol=symbol) or []
     except Exception:
         return []
 
 
 def _fetch_open_algo_orders_by_symbol(client: Client, symbol: str) -> List[dict]:
     try:
-        return client.futures_get_open_orders(symbol=symbol, conditional=True, requests_params={"timeout": 20}) or []
+        return client.futures_get_open_orders(symbol=symbol, conditional=True) or []
     except Exception:
         return []
 
 
+def _fetch_all_open_orders_grouped(
+    client: Client, symbols: Set[str]
+) -> Tuple[Dict[Tuple[str, str], List[dict]], Dict[Tuple[str, str], List[dict]]]:
+    """拉取普通挂单 + 条件单并按 (symbol, positionSide) 分组。
+
+    全账户查询权重为 40，按 symbol 查询为 1：币种少时逐个查询更省权重。
+    各请求在 _EXECUTOR 中并发执行。
+    """
+    if len(symbols) < ACCOUNT_WIDE_ORDERS_WEIGHT:
+        base_futs = [_EXECUTOR.submit(_fetch_open_orders_by_symbol, client, s) for s in symbols]
+        algo_futs = [_EXECUTOR.submit(_fetch_open_algo_orders_by_symbol, client, s) for s in symbols]
+    else:
+        base_futs = [_EXECUTOR.submit(_fetch_open_orders, client)]
+        algo_futs = [_EXECUTOR.submit(_fetch_open_algo_orders, client)]
+
+    base_by_key: Dict[Tuple[str, str], List[dict]] = {}
+    algo_by_key: Dict[Tuple[str, str], List[dict]] = {}
+    for futs, by_key in ((base_futs, base_by_key), (algo_futs, algo_by_key)):
+        for fut in futs:
+            for o in fut.result():
+                key = (o.get("symbol") or "", (o.get("positionSide") or "").upper())
+                by_key.setdefault(key, []).append(o)
+    return base_by_key, algo_by_key
+
+
 def _fetch_mark_prices_for_symbols(client: Client, symbols: List[str]) -> Dict[str, float]:
+    """不带 symbol 一次拉取全部合约标记价格，再本地挑出需要的。"""
+    wanted = {s for s in symbols if s}
+    if not wanted:
+        return {}
+    try:
+        rows = client.futures_mark_price() or []
+    except Exception:
+        return {}
     mark: Dict[str, float] = {}
-    for s in symbols:
-        if not s:
-            continue
-        try:
-            r = client.futures_mark_price(symbol=s, requests_params={"timeout": 20})
-            mp = _safe_float(r.get("markPrice"), 0.0)
-            if mp > 0:
-                mark[s] = mp
-        except Exception:
+    for r in rows:
+        symbol = r.get("symbol")
+        if symbol not in wanted:
             continue
+        mp = _safe_float(r.get("markPrice"), 0.0)
+        if mp > 0:
+            mark[symbol] = mp
     return mark
 
 
+def _is_true(v) -> bool:
+    # Binance 返回的是 JSON 布尔值；字符串形式只做兼容
+    return v is True or (isinstance(v, str) and v.lower() == "true")
+
+
 def _is_reduce_only_or_close_position(order: dict) -> bool:
-    v1 = order.get("reduceOnly")
-    v2 = order.get("closePosition")
-    return str(v1).lower() == "true" or str(v2).lower() == "true"
+    return _is_true(order.get("reduceOnly")) or _is_true(order.get("closePosition"))
 
 
 def _collect_stop_orders(
@@ -317,7 +497,8 @@ def _collect_stop_orders(
             continue
         if (o.get("positionSide") or "").upper() != position_side:
             continue
-        if (o.get("type") or "").upper() not in SL_ORDER_TYPES:
+        otype = (o.get("type") or "").upper()
+        if otype not in SL_ORDER_TYPES:
             continue
         if not _is_reduce_only_or_close_position(o):
             continue
@@ -329,7 +510,7 @@ def _collect_stop_orders(
                 "source": "base_order",
                 "symbol": symbol,
                 "position_side": position_side,
-                "type": (o.get("type") or "").upper(),
+                "type": otype,
                 "stop_price": stop_price,
                 "orderId": o.get("orderId"),
             }
@@ -340,7 +521,8 @@ def _collect_stop_orders(
             continue
         if (o.get("positionSide") or "").upper() != position_side:
             continue
-        if (o.get("orderType") or "").upper() not in SL_ORDER_TYPES:
+        otype = (o.get("orderType") or "").upper()
+        if otype not in SL_ORDER_TYPES:
             continue
         stop_price = _safe_float(o.get("triggerPrice"), 0.0)
         if stop_price <= 0:
@@ -350,7 +532,7 @@ def _collect_stop_orders(
                 "source": "algo_order",
                 "symbol": symbol,
                 "position_side": position_side,
-                "type": (o.get("orderType") or "").upper(),
+                "type": otype,
                 "stop_price": stop_price,
                 "algoId": o.get("algoId"),
                 "clientAlgoId": o.get("clientAlgoId"),
@@ -361,40 +543,51 @@ def _collect_stop_orders(
 
 
 def _pick_current_sl_price(position_side: str, stop_orders: List[dict]) -> Optional[float]:
-    prices = [o["stop_price"] for o in stop_orders if _safe_float(o.get("stop_price"), 0.0) > 0]
-    if not prices:
+    # stop_price 已在 _collect_stop_orders 中转为正浮点数
+    if not stop_orders:
         return None
     if position_side == "LONG":
-        return max(prices)
+        return max(o["stop_price"] for o in stop_orders)
     if position_side == "SHORT":
-        return min(prices)
+        return min(o["stop_price"] for o in stop_orders)
     return None
 
 
 def _enrich_snapshot_with_sl(client: Client, snapshot: dict, *, refresh_sec: float) -> None:
-    now_ts = time.time()
-    for p in snapshot.get("positions", []):
+    global _sl_snapshot_cache
+    if _sl_snapshot_cache.ttl != float(refresh_sec):
+        _sl_snapshot_cache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=float(refresh_sec))
+
+    positions = snapshot.get("positions", [])
+    # 缓存只读一次：若先判断 missing 再 get，条目可能在两次读取之间过期，导致该仓位既不在 missing 里也没有缓存
+    cached_map = {(p["symbol"], p["position_side"]): _sl_snapshot_cache.get((p["symbol"], p["position_side"])) for p in positions}
+    missing = {key[0] for key, cached in cached_map.items() if cached is None}
+    grouped = None
+    for p in positions:
         symbol = p["symbol"]
         position_side = p["position_side"]
 
         cache_key = (symbol, position_side)
-        cached = _sl_snapshot_cache.get(cache_key)
+        cached = cached_map[cache_key]
         if cached:
-            sl_price, sl_count, ts = cached
-            if now_ts - ts < float(refresh_sec):
-                p["sl_price"] = sl_price if sl_price > 0 else None
-                p["sl_count"] = int(sl_count)
-                continue
+            sl_price, sl_count = cached
+            p["sl_price"] = sl_price if sl_price > 0 else None
+            p["sl_count"] = int(sl_count)
+            continue
 
-        open_orders = _fetch_open_orders_by_symbol(client, symbol)
-        algo_orders = _fetch_open_algo_orders_by_symbol(client, symbol)
-        stop_orders = _collect_stop_orders(open_orders, algo_orders, symbol, position_side)
+        if grouped is None:
+            grouped = _fetch_all_open_orders_grouped(client, missing)
+        base_by_key, algo_by_key = grouped
+        stop_orders = _collect_stop_orders(
+            base_by_key.get(cache_key, []), algo_by_key.get(cache_key, []), symbol, position_side
+        )
         sl_price = _pick_current_sl_price(position_side, stop_orders)
         sl_count = len(stop_orders)
 
         p["sl_count"] = sl_count
         p["sl_price"] = sl_price
-        _sl_snapshot_cache[cache_key] = (float(sl_price or 0.0), int(sl_count), now_ts)
+        p["_stop_orders"] = stop_orders  # 本轮刚拉取，供 _auto_manage_sl 复用
+        _sl_snapshot_cache[cache_key] = (float(sl_price or 0.0), int(sl_count))
 
 
 def _cancel_existing_sl_orders(client: Client, symbol: str, position_side: str, stop_orders: List[dict]) -> List[str]:
@@ -467,21 +660,80 @@ def _place_market_close_position(client: Client, symbol: str, position_side: str
     )
 
 
+def _open_sl_log(path: str) -> TextIO:
+    """日志文件只打开一次（行缓冲追加），路径变化时才重新打开。"""
+    global _sl_log_fp, _sl_log_path
+    if _sl_log_fp is None or _sl_log_path != path:
+        _close_sl_log()
+        _sl_log_fp = open(path, "a", buffering=1, encoding="utf-8")
+        _sl_log_path = path
+    return _sl_log_fp
+
+
+def _close_sl_log() -> None:
+    global _sl_log_fp
+    if _sl_log_fp is not None:
+        try:
+            _sl_log_fp.close()
+        except Exception:
+            pass
+        _sl_log_fp = None
+
+
+atexit.register(_close_sl_log)
+
+
 def _append_sl_history(lines: List[str], *, max_keep: int, log_file: str) -> None:
+    global _sl_action_history
     if not lines:
         return
+    if _sl_action_history.maxlen != int(max_keep):
+        _sl_action_history = deque(_sl_action_history, maxlen=max(0, int(max_keep)))
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    for line in lines:
-        _sl_action_history.append(f"[{now}] {line}")
-    if len(_sl_action_history) > int(max_keep):
-        del _sl_action_history[: len(_sl_action_history) - int(max_keep)]
+    _sl_action_history.extend(f"[{now}] {line}" for line in lines)
     if log_file:
         try:
-            with open(log_file, "a", encoding="utf-8") as f:
-                for line in lines:
-                    f.write(f"[{now}] {line}\n")
+            f = _open_sl_log(log_file)
+            f.write("".join(f"[{now}] {line}\n" for line in lines))
         except Exception:
-            pass
+            _close_sl_log()
+
+
+def _compute_target_sl(
+    client: Client,
+    symbol: str,
+    is_long: bool,
+    entry: float,
+    mark: float,
+    buffer_price: float,
+    current_sl: Optional[float],
+    loss_ratio: float,
+    trail_ratio: float,
+    lock_active: bool,
+) -> Optional[float]:
+    """按方向计算目标止损价；sign/取整函数/收紧方向一次确定，无法安全挂单时返回 None。"""
+    sign = 1.0 if is_long else -1.0
+    normalize = _normalize_price_floor if is_long else _normalize_price_ceil
+    tighter = max if is_long else min
+
+    base_sl = normalize(client, symbol, entry * (1.0 - sign * loss_ratio))
+    safe = mark - sign * buffer_price
+    if lock_active:
+        target_sl = tighter(base_sl, entry, mark * (1.0 - sign * trail_ratio))
+        if is_long and safe <= 0:
+            return None
+        if sign * (target_sl - safe) >= 0:
+            target_sl = safe
+    else:
+        target_sl = base_sl
+
+    target_sl = normalize(client, symbol, target_sl)
+    if sign * (target_sl - safe) >= 0:
+        return None
+
+    if current_sl is not None and current_sl > 0:
+        target_sl = tighter(target_sl, float(current_sl))
+    return target_sl
 
 
 def _auto_manage_sl(
@@ -498,8 +750,20 @@ def _auto_manage_sl(
 ) -> List[str]:
     messages: List[str] = []
     now_ts = time.time()
-
-    for p in snapshot.get("positions", []):
+    positions = snapshot.get("positions", [])
+    missing = {p["symbol"] for p in positions if p.get("_stop_orders") is None}
+    grouped = None
+
+    max_loss = abs(float(max_loss_pct))
+    loss_ratio = max_loss / 100.0
+    trail_ratio = float(trail_pct) / 100.0
+    lock_activate = float(lock_profit_activate_pct)
+    min_interval = float(min_interval_sec)
+    buffer_n = float(max(0, buffer_ticks))
+    lock_mode_txt = f"锁盈>=保本+跟踪({lock_activate:.2f}%触发, 回撤{float(trail_pct):.2f}%)"
+    loss_mode_txt = f"最大亏损 -{max_loss:.2f}%"
+
+    for p in positions:
         symbol = p["symbol"]
 
         position_side = p["position_side"]
@@ -511,30 +775,44 @@ def _auto_manage_sl(
             continue
 
         tick = _get_tick_size(client, symbol)
-        buffer_price = max(tick * float(max(0, buffer_ticks)), 0.0)
+        buffer_price = max(tick * buffer_n, 0.0)
 
-        profit_pct = 0.0
-        if position_side == "LONG":
-            profit_pct = (mark - entry) / entry * 100.0 if entry > 0 else 0.0
-        elif position_side == "SHORT":
-            profit_pct = (entry - mark) / entry * 100.0 if entry > 0 else 0.0
-        else:
+        if position_side not in ("LONG", "SHORT"):
             continue
+        is_long = position_side == "LONG"
+        sign = 1.0 if is_long else -1.0
+        side_txt = "做多" if is_long else "做空"
+        profit_pct = sign * (mark - entry) / entry * 100.0
 
         key = (symbol, position_side)
         last_ts = _last_sl_update_at.get(key, 0.0)
-        if now_ts - last_ts < float(min_interval_sec):
+        if now_ts - last_ts < min_interval:
             continue
 
-        open_orders = _fetch_open_orders_by_symbol(client, symbol)
-        algo_orders = _fetch_open_algo_orders_by_symbol(client, symbol)
-        stop_orders = _collect_stop_orders(open_orders, algo_orders, symbol, position_side)
+        lock_active = profit_pct >= lock_activate
+        stop_orders = p.get("_stop_orders")
+        cached_sl = p.get("sl_price")
+        if stop_orders is None and profit_pct > -max_loss and p.get("sl_count") == 1 and cached_sl:
+            # 快照缓存显示恰有一张止损单：先按缓存止损价判断，无需改单则不必拉取挂单
+            target_sl = _compute_target_sl(
+                client, symbol, is_long, entry, mark, buffer_price, cached_sl, loss_ratio, trail_ratio, lock_active
+            )
+            if target_sl is None or target_sl <= 0 or sign * (target_sl - float(cached_sl)) <= tick:
+                continue
+
+        if stop_orders is None:
+            if grouped is None:
+                grouped = _fetch_all_open_orders_grouped(client, missing)
+            base_by_key, algo_by_key = grouped
+            stop_orders = _collect_stop_orders(
+                base_by_key.get(key, []), algo_by_key.get(key, []), symbol, position_side
+            )
         current_sl = _pick_current_sl_price(position_side, stop_orders)
 
-        if profit_pct <= -abs(float(max_loss_pct)):
+        if profit_pct <= -max_loss:
             if verbose:
                 messages.append(
-                    f"触发：{symbol} {('做多' if position_side=='LONG' else '做空')} 当前收益率 {profit_pct:.2f}% <= -{abs(float(max_loss_pct)):.2f}%"
+                    f"触发：{symbol} {side_txt} 当前收益率 {profit_pct:.2f}% <= -{max_loss:.2f}%"
                 )
 
             if dry_run:
@@ -548,94 +826,35 @@ def _auto_manage_sl(
                 _last_sl_update_at[key] = now_ts
                 oid = order.get("orderId") or order.get("clientOrderId") or ""
                 oid_txt = f"；市价平仓单 {oid}" if oid else ""
-                messages.append(f"已平仓：{symbol} {position_side}（触发最大亏损 -{abs(float(max_loss_pct)):.2f}%）{oid_txt}")
+                messages.append(f"已平仓：{symbol} {position_side}（触发最大亏损 -{max_loss:.2f}%）{oid_txt}")
             except Exception as e:
                 _last_sl_update_at[key] = now_ts
                 messages.append(f"失败：{symbol} {position_side} 市价平仓异常：{e}")
             continue
 
-        loss_ratio = abs(float(max_loss_pct)) / 100.0
-        lock_active = profit_pct >= float(lock_profit_activate_pct)
-        target_sl: Optional[float] = None
-
-        if position_side == "LONG":
-            base_sl = entry * (1.0 - loss_ratio)
-            base_sl = _normalize_price_floor(client, symbol, float(base_sl))
-            if lock_active:
-                trail_candidate = mark * (1.0 - float(trail_pct) / 100.0)
-                target_sl = max(base_sl, entry, float(trail_candidate))
-                safe_max = mark - buffer_price
-                if safe_max <= 0:
-                    continue
-                if target_sl >= safe_max:
-                    target_sl = safe_max
-            else:
-                target_sl = base_sl
-
-            target_sl = _normalize_price_floor(client, symbol, float(target_sl))
-            if float(target_sl) >= mark - buffer_price:
-                continue
-
-            if current_sl is not None and current_sl > 0:
-                target_sl = max(float(target_sl), float(current_sl))
-
-        elif position_side == "SHORT":
-            base_sl = entry * (1.0 + loss_ratio)
-            base_sl = _normalize_price_ceil(client, symbol, float(base_sl))
-            if lock_active:
-                trail_candidate = mark * (1.0 + float(trail_pct) / 100.0)
-                target_sl = min(base_sl, entry, float(trail_candidate))
-                safe_min = mark + buffer_price
-                if target_sl <= safe_min:
-                    target_sl = safe_min
-            else:
-                target_sl = base_sl
-
-            target_sl = _normalize_price_ceil(client, symbol, float(target_sl))
-            if float(target_sl) <= mark + buffer_price:
-                continue
-
-            if current_sl is not None and current_sl > 0:
-                target_sl = min(float(target_sl), float(current_sl))
-
-        else:
-            continue
-
+        target_sl = _compute_target_sl(
+            client, symbol, is_long, entry, mark, buffer_price, current_sl, loss_ratio, trail_ratio, lock_active
+        )
         if target_sl is None or target_sl <= 0:
             continue
 
-        needs_update = False
+        # 已有止损与目标相差不足一个 tick 且只有一张止损单 → 无需改单，直接跳过
         if current_sl is None or current_sl <= 0:
             needs_update = True
         else:
-            if position_side == "LONG" and float(current_sl) < float(target_sl) - tick:
-                needs_update = True
-            elif position_side == "SHORT" and float(current_sl) > float(target_sl) + tick:
-                needs_update = True
-            elif len(stop_orders) != 1 and abs(float(current_sl) - float(target_sl)) < tick:
-                needs_update = True
+            gap = sign * (target_sl - float(current_sl))
+            needs_update = gap > tick or (len(stop_orders) != 1 and abs(gap) < tick)
 
         if not needs_update:
             continue
 
         new_sl = float(target_sl)
 
-        if new_sl is None:
-            continue
-
-        if current_sl is not None and current_sl > 0 and abs(float(new_sl) - float(current_sl)) < tick:
-            if len(stop_orders) == 1:
-                continue
-
-        mode_txt = (
-            f"锁盈>=保本+跟踪({float(lock_profit_activate_pct):.2f}%触发, 回撤{float(trail_pct):.2f}%)"
-            if lock_active
-            else f"最大亏损 -{abs(float(max_loss_pct)):.2f}%"
-        )
+        mode_txt = lock_mode_txt if lock_active else loss_mode_txt
 
         if dry_run:
             messages.append(
-                f"模拟：{symbol} {('做多' if position_side=='LONG' else '做空')} 止损 {current_sl or 0:.6f} -> {new_sl:.6f}（{mode_txt}）"
+                f"模拟：{symbol} {side_txt} 止损 {current_sl or 0:.6f} -> {new_sl:.6f}（{mode_txt}）"
             )
             _last_sl_update_at[key] = now_ts
             continue
@@ -648,7 +867,7 @@ def _auto_manage_sl(
             canceled_txt = f"；已撤销 {len(canceled)} 个旧止损" if canceled else "；无旧止损可撤销"
             oid_txt = f"；新止损单 {oid}" if oid else ""
             messages.append(
-                f"已更新：{symbol} {('做多' if position_side=='LONG' else '做空')} 止损 {current_sl or 0:.6f} -> {new_sl:.6f}（{mode_txt}）{canceled_txt}{oid_txt}"
+                f"已更新：{symbol} {side_txt} 止损 {current_sl or 0:.6f} -> {new_sl:.6f}（{mode_txt}）{canceled_txt}{oid_txt}"
             )
         except Exception as e:
             _last_sl_update_at[key] = now_ts
@@ -657,6 +876,24 @@ def _auto_manage_sl(
     return messages
 
 
+SNAPSHOT_COLS = [
+    ("合约", 12, "left"),
+    ("方向", 6, "left"),
+    ("数量", 14, "right"),
+    ("开仓价", 14, "right"),
+    ("标记价", 14, "right"),
+    ("未实现盈亏", 14, "right"),
+    ("收益率", 8, "right"),
+    ("杠杆", 4, "right"),
+    ("止损价", 14, "right"),
+    ("两平价", 14, "right"),
+]
+SNAPSHOT_RULE = "-" * (sum(w for _, w, _ in SNAPSHOT_COLS) + (len(SNAPSHOT_COLS) - 1))
+SNAPSHOT_HEADER = " ".join(_pad(label, w, align) for label, w, align in SNAPSHOT_COLS)
+# 行模板与 SNAPSHOT_COLS 宽度一致；方向列含中文，先经 _pad 按显示宽度对齐再传入
+ROW_FMT = "{:<12.12s} {} {:>14.6f} {:>14.6f} {:>14.6f} {:>14.4f} {:>7.2f}% {:>4d} {:>14s} {:>14.6f}"
+
+
 def _print_snapshot(snapshot: dict, symbols_filter: Optional[Set[str]], auto_sl_enabled: bool):
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     wallet = snapshot["wallet_balance"]
@@ -666,23 +903,9 @@ def _print_snapshot(snapshot: dict, symbols_filter: Optional[Set[str]], auto_sl_
     print(
         f"[{now}] 钱包余额={wallet:.4f}  可用余额={available:.4f}  未实现盈亏={unreal:.4f}  自动止损={'开启' if auto_sl_enabled else '关闭'}"
     )
-    cols = [
-        ("合约", 12, "left"),
-        ("方向", 6, "left"),
-        ("数量", 14, "right"),
-        ("开仓价", 14, "right"),
-        ("标记价", 14, "right"),
-        ("未实现盈亏", 14, "right"),
-        ("收益率", 8, "right"),
-        ("杠杆", 4, "right"),
-        ("止损价", 14, "right"),
-        ("两平价", 14, "right"),
-    ]
-    total_width = sum(w for _, w, _ in cols) + (len(cols) - 1)
-    line = "-" * total_width
-    print(line)
-    print(" ".join(_pad(label, w, align) for label, w, align in cols))
-    print(line)
+    print(SNAPSHOT_RULE)
+    print(SNAPSHOT_HEADER)
+    print(SNAPSHOT_RULE)
 
     rows = 0
     for p in snapshot["positions"]:
@@ -691,19 +914,20 @@ def _print_snapshot(snapshot: dict, symbols_filter: Optional[Set[str]], auto_sl_
         rows += 1
         sl = p.get("sl_price")
         sl_str = f"{float(sl):.6f}" if sl else "-"
-        row = [
-            (p["symbol"], 12, "left"),
-            (p["side"], 6, "left"),
-            (f"{p['qty']:.6f}", 14, "right"),
-            (f"{p['entry']:.6f}", 14, "right"),
-            (f"{p['mark']:.6f}", 14, "right"),
-            (f"{p['pnl']:.4f}", 14, "right"),
-            (f"{p['pnl_pct']:.2f}%", 8, "right"),
-            (f"{p['leverage']:d}", 4, "right"),
-            (sl_str, 14, "right"),
-            (f"{p['entry']:.6f}", 14, "right"),
-        ]
-        print(" ".join(_pad(text, w, align) for text, w, align in row))
+        print(
+            ROW_FMT.format(
+                p["symbol"],
+                _pad(p["side"], 6, "left"),
+                p["qty"],
+                p["entry"],
+                p["mark"],
+                p["pnl"],
+                p["pnl_pct"],
+                p["leverage"],
+                sl_str,
+                p["entry"],
+            )
+        )
 
     if rows == 0:
         print("(当前无持仓)")
@@ -716,6 +940,9 @@ def main() -> int:
 
     client = _build_client()
 
+    if DEFAULT_CLEAR_SCREEN and os.name == "nt":
+        os.system("")  # 开启 Windows 控制台的 ANSI(VT) 转义支持
+
     try:
         while True:
             try:
@@ -753,11 +980,13 @@ def main() -> int:
                         print()
                         print("止损操作记录（最近 {} 条）".format(min(n, len(_sl_action_history))))
                         print("-" * 40)
-                        for line in _sl_action_history[-n:]:
+                        for line in islice(_sl_action_history, max(0, len(_sl_action_history) - n), None):
                             print(line)
             except BinanceAPIException as e:
                 code = getattr(e, "code", None)
                 if code == -1003:
+                    # 同 IP 其它程序也在消耗权重：清空本地令牌桶，再做退避
+                    client.bucket.drain()
                     now_ts = time.time()
                     if now_ts - _last_rate_limit_notice_ts > 5.0:
                         _last_rate_limit_notice_ts = now_ts
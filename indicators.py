@@ -1,48 +1,49 @@
-import json
+import orjson
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import numpy as np
 import talib
+from cachetools import TTLCache
 from database import redis_client
+from kline_fetcher import decode_kline
 from deepseek_batch_pusher import add_to_batch
 from config import timeframes
 from datetime import datetime, timezone
-from decimal import Decimal, getcontext
-
-# 提高累加精度
-getcontext().prec = 20
 
 # ==========================================================
 # 🔥 CVD 系列指标计算
 # ==========================================================
 def compute_cvd_indicators(rows):
     """
-    计算 CVD 系列指标，保证跨服务器结果一致
+    计算 CVD 系列指标（numpy 向量化累加）
     输入:
         rows: K 线列表，每项包含 TakerBuyVolume 和 TakerSellVolume
     输出:
         dict: 包含 CVD, CVD_MOM, CVD_NORM, CVD_DIVERGENCE, CVD_PEAKFLIP
     """
-    cvd = []
-    cumulative = Decimal(0)
-    closes = [Decimal(str(k["Close"])) for k in rows]
-
-    for k in rows:
-        buy = Decimal(str(k.get("TakerBuyVolume", 0)))
-        sell = Decimal(str(k.get("TakerSellVolume", 0)))
-        cumulative += buy - sell
-        cvd.append(cumulative)
+    n = len(rows)
+    # 单次遍历直接生成每根 K 线的净主动量，cumsum 原地累加，不产生中间数组
+    cvd = np.fromiter(
+        (k.get("TakerBuyVolume", 0) - k.get("TakerSellVolume", 0) for k in rows),
+        dtype=np.float64, count=n,
+    )
+    np.cumsum(cvd, out=cvd)
 
     # 累积值
-    CVD = cvd[-1]
-    CVD_MOM = CVD - cvd[-6] if len(cvd) > 6 else Decimal(0)
+    CVD = float(cvd[-1])
+    CVD_MOM = CVD - float(cvd[-6]) if n > 6 else 0.0
 
     # 归一化
-    mn, mx = min(cvd), max(cvd)
-    CVD_NORM = (CVD - mn) / (mx - mn) if mx > mn else Decimal('0.5')
+    mn, mx = float(cvd.min()), float(cvd.max())
+    CVD_NORM = (CVD - mn) / (mx - mn) if mx > mn else 0.5
 
     # 分析背离
-    price_now = closes[-1]
-    price_prev = closes[-6] if len(closes) > 6 else closes[0]
-    cvd_prev = cvd[-6] if len(cvd) > 6 else cvd[0]
+    # 背离只用到两个收盘价，无需整列转换
+    price_now = float(rows[-1]["Close"])
+    price_prev = float(rows[-6]["Close"] if n > 6 else rows[0]["Close"])
+    cvd_prev = cvd[-6] if n > 6 else cvd[0]
 
     if price_now > price_prev and CVD < cvd_prev:
         CVD_DIV = "bearish"
@@ -52,7 +53,7 @@ def compute_cvd_indicators(rows):
         CVD_DIV = "neutral"
 
     # 峰值翻转
-    if len(cvd) > 3:
+    if n > 3:
         if cvd[-1] < cvd[-2] and cvd[-2] > cvd[-3]:
             CVD_PEAKFLIP = "top"
         elif cvd[-1] > cvd[-2] and cvd[-2] < cvd[-3]:
@@ -63,42 +64,114 @@ def compute_cvd_indicators(rows):
         CVD_PEAKFLIP = "none"
 
     return {
-        "CVD": round(float(CVD), 2),
-        "CVD_MOM": round(float(CVD_MOM), 2),
-        "CVD_NORM": round(float(CVD_NORM), 6),
+        "CVD": round(CVD, 2),
+        "CVD_MOM": round(CVD_MOM, 2),
+        "CVD_NORM": round(CVD_NORM, 6),
         "CVD_DIVERGENCE": CVD_DIV,
         "CVD_PEAKFLIP": CVD_PEAKFLIP,
     }
 
 # ==========================================================
-# 🔥 计算单周期指标
+# 🔥 K 线行缓存（只解析新增的已收盘 K 线）
 # ==========================================================
-def calculate_signal(symbol, interval):
+ROWS_CACHE_TTL_SEC = 3600
+
+# (symbol, interval) → 按时间排序的已解析行；超过 TTL 未访问（币已移出监控池）自动淘汰
+_rows_cache = TTLCache(maxsize=4096, ttl=ROWS_CACHE_TTL_SEC)
+# 各周期在线程池中并行计算；TTLCache 本身非线程安全，读写时加锁
+_cache_lock = threading.Lock()
+
+
+def _load_rows(symbol, interval):
+    key = (symbol, interval)
     rkey = f"historical_data:{symbol}:{interval}"
-    data = redis_client.hgetall(rkey)
-    if not data:
-        return
+    with _cache_lock:
+        rows = _rows_cache.get(key)
+
+    if rows:
+        # 只取上次末根之后的 K 线；首根时间戳与总数对得上才说明缓存前缀仍有效
+        pipe = redis_client.pipeline()
+        pipe.zcard(rkey)
+        pipe.zrange(rkey, 0, 0)
+        pipe.zrangebyscore(rkey, f"({rows[-1]['Timestamp']}", "+inf")
+        total, head, fresh = pipe.execute()
+        if head and total == len(rows) + len(fresh) and orjson.loads(head[0])[0] == rows[0]["Timestamp"]:
+            rows.extend(map(decode_kline, fresh))
+        else:
+            rows = None
 
-    rows = sorted(data.items(), key=lambda x: int(x[0]))
-    rows = [{"Timestamp": int(ts), **json.loads(v)} for ts, v in rows]
+    if not rows:
+        # 有序集合按时间戳返回，无需再排序
+        rows = list(map(decode_kline, redis_client.zrange(rkey, 0, -1)))
 
-    # if len(rows) < 120:
-        # print(f"⚠ {symbol} {interval} 数据不足，无法计算指标\n")
-        # return
+    with _cache_lock:
+        if rows:
+            _rows_cache[key] = rows
+        else:
+            _rows_cache.pop(key, None)
+    return rows
+
+# ==========================================================
+# 🔥 ATR 增量计算
+# ==========================================================
+ATR_PERIOD = 14
+ATR_MA_WINDOW = 20
+
+# (symbol, interval) → (first_ts, last_ts, count, prev_close, prev_atr, atr_tail)
+_atr_state = TTLCache(maxsize=4096, ttl=ROWS_CACHE_TTL_SEC)
+
+
+def _calc_atr(key, rows):
+    """
+    首次（或历史被重建时）用 TA-Lib 全量计算并播种状态，
+    之后只对新增的已收盘 K 线做 Wilder 递推：atr = (prev_atr * 13 + tr) / 14
+    """
+    n = len(rows)
+    with _cache_lock:
+        st = _atr_state.get(key)
+    if st is not None:
+        first_ts, last_ts, count, prev_close, prev_atr, tail = st
+        # 首根与上次末根位置都对得上 → 之前的序列未变，只需追加
+        if n >= count and rows[0]["Timestamp"] == first_ts and rows[count - 1]["Timestamp"] == last_ts:
+            for k in islice(rows, count, None):
+                h, l = float(k["High"]), float(k["Low"])
+                tr = max(h - l, abs(h - prev_close), abs(l - prev_close))
+                prev_atr = (prev_atr * (ATR_PERIOD - 1) + tr) / ATR_PERIOD
+                prev_close = float(k["Close"])
+                tail.append(prev_atr)
+            with _cache_lock:
+                _atr_state[key] = (first_ts, rows[-1]["Timestamp"], n, prev_close, prev_atr, tail)
+            return prev_atr, float(np.nanmean(tail))
 
-    # 🔥 ATR（唯一保留的传统指标）
     closes = np.array([float(k["Close"]) for k in rows], dtype=np.float64)
     highs = np.array([float(k["High"]) for k in rows], dtype=np.float64)
     lows = np.array([float(k["Low"]) for k in rows], dtype=np.float64)
-    # 🔥 ATR（14周期）
-    atr_series = talib.ATR(highs, lows, closes, timeperiod=14)
-    atr_current = atr_series[-1]
+    atr_series = talib.ATR(highs, lows, closes, timeperiod=ATR_PERIOD)
+    atr_current = float(atr_series[-1])
+    tail = deque(atr_series[-ATR_MA_WINDOW:].tolist(), maxlen=ATR_MA_WINDOW)
+
+    # 数据不足 14 根时 ATR 为 NaN，无法递推，下次继续全量
+    with _cache_lock:
+        if np.isnan(atr_current):
+            _atr_state.pop(key, None)
+        else:
+            _atr_state[key] = (rows[0]["Timestamp"], rows[-1]["Timestamp"], n, float(closes[-1]), atr_current, tail)
+    return atr_current, float(np.nanmean(tail))
 
-    # 🔥 ATR 过去 20 周期均值
-    if len(atr_series) >= 20:
-        atr_ma20 = np.nanmean(atr_series[-20:])
-    else:
-        atr_ma20 = np.nanmean(atr_series)
+# ==========================================================
+# 🔥 计算单周期指标
+# ==========================================================
+def calculate_signal(symbol, interval):
+    rows = _load_rows(symbol, interval)
+    if not rows:
+        return
+
+    # if len(rows) < 120:
+        # print(f"⚠ {symbol} {interval} 数据不足，无法计算指标\n")
+        # return
+
+    # 🔥 ATR（唯一保留的传统指标，14 周期）及过去 20 周期均值
+    atr_current, atr_ma20 = _calc_atr((symbol, interval), rows)
 
     # 🔥 CVD 系列指标
     cvd_pack = compute_cvd_indicators(rows)
@@ -106,8 +179,8 @@ def calculate_signal(symbol, interval):
     # 汇总指标
     indicators = {
         **cvd_pack,
-        "ATR": float(atr_current),
-        "ATR_MA20": float(atr_ma20),
+        "ATR": atr_current,
+        "ATR_MA20": atr_ma20,
     }
 
     # 仅投喂最近 10 根 K 线
@@ -122,7 +195,16 @@ def calculate_signal(symbol, interval):
         # print(f"{ts} → O:{k['Open']} H:{k['High']} L:{k['Low']} C:{k['Close']} V:{k['Volume']}")
     # print("")   # 空行美化
 
+# 同一币种的各周期互不依赖，Redis 读取与 TA-Lib 计算可在线程间重叠
+_signal_exec = ThreadPoolExecutor(max_workers=max(1, min(8, len(timeframes))), thread_name_prefix="signal")
+
+
 def calculate_signal_single(symbol):
-    for tf in timeframes:
-        calculate_signal(symbol, tf)
+    list(_signal_exec.map(calculate_signal, [symbol] * len(timeframes), timeframes))
+
+
+def calculate_signals(symbols):
+    """所有币种 × 周期一起投入线程池（扁平提交，避免在池内再嵌套提交）"""
+    pairs = [(s, tf) for s in symbols for tf in timeframes]
+    list(_signal_exec.map(lambda pair: calculate_signal(*pair), pairs))
 
@@ -1,38 +1,131 @@
 import time
-import json
+import asyncio
 import logging
+import aiohttp
+import numpy as np
+import orjson
+import threading
 import requests
-from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, wait
 from config import monitor_symbols, timeframes
-from database import redis_client
+from database import redis_client, APP_KEYSET
 
-def fetch_historical(symbol, interval, limit=301):
-    url = f"https://fapi.binance.com/fapi/v1/klines?symbol={symbol}&interval={interval}&limit={limit}"
+# 每个 symbol:interval 最新一根已收盘 K 线（hash，field = "symbol:interval"）
+LATEST_KEY = "historical_data_latest"
+# 已写入的历史 K 线键集合（set），清理时按集合比对，无需 KEYS 扫描
+HISTORY_INDEX_KEY = "historical_data_index"
+
+# K 线在 Redis 中存为定长 JSON 数组（不重复存字段名），顺序即 KLINE_FIELDS
+KLINE_FIELDS = ("Timestamp", "Open", "High", "Low", "Close", "Volume", "TakerBuyVolume", "TakerSellVolume")
+
+
+def decode_kline(raw):
+    """Redis 中的 K 线成员 → 带字段名的 dict"""
+    return dict(zip(KLINE_FIELDS, orjson.loads(raw)))
+
+# 常驻下载线程池：每个工作线程持有自己的 requests.Session，复用到 Binance 的 TLS 连接
+_local = threading.local()
+
+
+def _init_worker():
+    session = requests.Session()
+    # 连接复用之外，对连接错误 / 5xx 做少量退避重试，避免单次抖动导致该周期本轮缺数据
+    retry = Retry(total=2, backoff_factor=0.2, status_forcelist=(500, 502, 503, 504))
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    _local.session = session
+
+
+_fetch_exec = ThreadPoolExecutor(max_workers=8, thread_name_prefix="kline", initializer=_init_worker)
+
+
+KLINE_URL = "https://fapi.binance.com/fapi/v1/klines"
+ASYNC_FETCH_CONCURRENCY = 32
+ASYNC_FETCH_RETRIES = 2
+STORE_FLUSH_COMMANDS = 500
+
+
+def _queue_klines(pipe, symbol, interval, data):
+    """把一组 K 线的写入命令加入 pipe（不执行），返回加入的命令数"""
     rkey = f"historical_data:{symbol}:{interval}"
+    now = int(time.time() * 1000)
 
-    try:
-        data = requests.get(url, timeout=5).json()
-        now = int(time.time() * 1000)
-
-        with redis_client.pipeline() as pipe:
-            for k in data:
-                ts, close_ts = k[0], k[6]
-                if close_ts > now:
-                    continue
-
-                entry = json.dumps({
-                    "Open": float(k[1]),
-                    "High": float(k[2]),
-                    "Low": float(k[3]),
-                    "Close": float(k[4]),
-                    "Volume": float(k[5]),
-                    "TakerBuyVolume": float(k[9]),
-                    "TakerSellVolume": float(k[5]) - float(k[9])
-                })
-
-                pipe.hset(rkey, ts, entry)
+    closed = [k for k in data if k[6] <= now]
+    if not closed:
+        return 0
+
+    # 数值列一次性转成 float64 矩阵：O / H / L / C / V / 主动买量，主动卖量向量化相减
+    cols = np.array([(k[1], k[2], k[3], k[4], k[5], k[9]) for k in closed], dtype=np.float64)
+    sell = (cols[:, 4] - cols[:, 5]).tolist()
+
+    # 历史 K 线存为有序集合：score = 开盘时间，成员为按 KLINE_FIELDS 排列的数组（含 Timestamp），读取端无需再排序
+    bars = {}
+    for k, row, s in zip(closed, cols.tolist(), sell):
+        entry = orjson.dumps([k[0], *row, s])
+        bars[entry] = k[0]
+
+    # 先清掉本次覆盖的时间段，同一根 K 线不会以不同成员重复出现
+    pipe.zremrangebyscore(rkey, min(bars.values()), max(bars.values()))
+    pipe.zadd(rkey, bars)
+    pipe.hset(LATEST_KEY, f"{symbol}:{interval}", entry)
+    pipe.sadd(HISTORY_INDEX_KEY, rkey)
+    pipe.sadd(APP_KEYSET, rkey, LATEST_KEY, HISTORY_INDEX_KEY)
+    return 5
+
+
+def _store_klines(symbol, interval, data):
+    with redis_client.pipeline() as pipe:
+        if _queue_klines(pipe, symbol, interval, data):
             pipe.execute()
 
+
+def _store_klines_many(results):
+    """所有 (symbol, interval, data) 合并进少量大 pipeline，每约 STORE_FLUSH_COMMANDS 条命令提交一次"""
+    pending = 0
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for symbol, interval, data in results:
+                try:
+                    pending += _queue_klines(pipe, symbol, interval, data)
+                except Exception as e:
+                    logging.warning(f"{symbol} {interval} 历史获取失败: {e}")
+                if pending >= STORE_FLUSH_COMMANDS:
+                    pipe.execute()
+                    pending = 0
+            if pending:
+                pipe.execute()
+    except Exception as e:
+        logging.warning(f"K 线批量写入失败: {e}")
+
+
+def cleanup_stale_history(valid_symbols):
+    """删除不在监控池中的币种的历史 K 线，返回被清理的币种列表"""
+    stale = []
+    for rkey in redis_client.smembers(HISTORY_INDEX_KEY):
+        parts = rkey.split(":")
+        if len(parts) == 3 and parts[1] not in valid_symbols:
+            stale.append(rkey)
+    if not stale:
+        return []
+
+    with redis_client.pipeline() as pipe:
+        pipe.delete(*stale)
+        pipe.srem(HISTORY_INDEX_KEY, *stale)
+        pipe.srem(APP_KEYSET, *stale)
+        pipe.hdel(LATEST_KEY, *(k.split(":", 1)[1] for k in stale))
+        pipe.execute()
+    return list(dict.fromkeys(k.split(":")[1] for k in stale))
+
+
+def fetch_historical(symbol, interval, limit=301):
+    url = f"{KLINE_URL}?symbol={symbol}&interval={interval}&limit={limit}"
+
+    try:
+        http = getattr(_local, "session", requests)
+        data = orjson.loads(http.get(url, timeout=5).content)
+        _store_klines(symbol, interval, data)
+
     except Exception as e:
         logging.warning(f"{symbol} {interval} 历史获取失败: {e}")
 
@@ -43,10 +136,7 @@ def fetch_all():
     start_time = time.time()
 
     time.sleep(2)
-    with ThreadPoolExecutor(max_workers=8) as exe:
-        for s in monitor_symbols:
-            for tf in timeframes:
-                exe.submit(fetch_historical, s, tf)
+    wait([_fetch_exec.submit(fetch_historical, s, tf) for s in monitor_symbols for tf in timeframes])
 
     elapsed = time.time() - start_time
     avg = elapsed / total_requests
@@ -54,3 +144,44 @@ def fetch_all():
     print(f"📌 历史数据初始化完成 ✓")
     print(f"⏱ 总耗时: {elapsed:.2f} 秒 (平均单请求: {avg:.3f} 秒)")
 
+
+# ==========================================================
+# 🔥 异步批量下载（调度循环中使用，不阻塞事件循环）
+# ==========================================================
+async def _fetch_historical_async(session, symbol, interval, limit=301):
+    params = {"symbol": symbol, "interval": interval, "limit": limit}
+    for attempt in range(ASYNC_FETCH_RETRIES + 1):
+        try:
+            async with session.get(KLINE_URL, params=params) as resp:
+                resp.raise_for_status()
+                data = orjson.loads(await resp.read())
+            return symbol, interval, data
+        except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
+            if attempt == ASYNC_FETCH_RETRIES:
+                logging.warning(f"{symbol} {interval} 历史获取失败: {e}")
+                return None
+            await asyncio.sleep(0.2 * 2 ** attempt)
+
+
+async def fetch_all_async():
+    total_requests = len(monitor_symbols) * len(timeframes)
+    print(f"⏳ 初始化下载中... 预计请求数: {total_requests}")
+
+    start_time = time.time()
+
+    await asyncio.sleep(2)
+    connector = aiohttp.TCPConnector(limit=ASYNC_FETCH_CONCURRENCY, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=5)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        results = await asyncio.gather(*(
+            _fetch_historical_async(session, s, tf) for s in monitor_symbols for tf in timeframes
+        ))
+
+    # 下载完成后统一写入 Redis（同步调用，放到线程里执行）
+    await asyncio.to_thread(_store_klines_many, [r for r in results if r])
+
+    elapsed = time.time() - start_time
+    avg = elapsed / total_requests if total_requests else 0.0
+
+    print(f"📌 历史数据初始化完成 ✓")
+    print(f"⏱ 总耗时: {elapsed:.2f} 秒 (平均单请求: {avg:.3f} 秒)")
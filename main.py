@@ -18,14 +18,17 @@ from indicators import calculate_signal
 from config import monitor_symbols, timeframes
 import asyncio
 from scheduler import schedule_loop_async
-from deepseek_batch_pusher import _is_ready_for_push, push_batch_to_deepseek
+from deepseek_batch_pusher import _is_ready_for_push, push_batch_to_deepseek, close_session
 import subprocess
 import signal
 import os
 import oi
 
 async def run_async():
-    await schedule_loop_async()
+    try:
+        await schedule_loop_async()
+    finally:
+        await close_session()
 
 def main():
     clear_redis()
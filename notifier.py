@@ -1,26 +1,51 @@
 import time
 import requests
 import logging
-from queue import Queue
+from queue import Empty, Queue
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
 
 message_queue = Queue()
 
+# 只有 message_worker 一个线程发送，复用同一个 Session 保持到 Telegram 的长连接
+_tg_session = requests.Session()
+TG_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+TG_MAX_LEN = 4096      # Telegram 单条消息长度上限
+TG_BATCH_MAX = 10      # 单次最多合并的排队消息数
+
 def send_telegram_message(message):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     try:
-        requests.post(url, json={"chat_id": TELEGRAM_CHAT_ID, "text": message})
+        _tg_session.post(TG_URL, json={"chat_id": TELEGRAM_CHAT_ID, "text": message}, timeout=10)
     except Exception as e:
         logging.warning(f"TG发送失败: {e}")
 
 def queue_message(msg):
     message_queue.put(msg)
 
+def _pack_messages(msgs):
+    """把多条消息用空行拼接，单条不超过 TG_MAX_LEN（本身超长的消息原样单独发送）"""
+    packed, cur = [], ""
+    for m in msgs:
+        if cur and len(cur) + 2 + len(m) > TG_MAX_LEN:
+            packed.append(cur)
+            cur = m
+        else:
+            cur = f"{cur}\n\n{m}" if cur else m
+    if cur:
+        packed.append(cur)
+    return packed
+
 def message_worker():
     while True:
-        msg = message_queue.get()
-        if msg:
-            send_telegram_message(msg)
+        # 取出当前已排队的消息（最多 TG_BATCH_MAX 条）合并发送，避免 N 条信号串行等待 N×2 秒
+        msgs = [message_queue.get()]
+        while len(msgs) < TG_BATCH_MAX:
+            try:
+                msgs.append(message_queue.get_nowait())
+            except Empty:
+                break
+        for text in _pack_messages([m for m in msgs if m]):
+            send_telegram_message(text)
             time.sleep(2)
-        message_queue.task_done()
+        for _ in msgs:
+            message_queue.task_done()
 
@@ -1,12 +1,13 @@
 import asyncio
 import aiohttp
+import orjson
 import time
 from datetime import datetime, timedelta, timezone
 from config import (
     OI_BASE_URL, OI_THRESHOLD, OI_CONCURRENCY, OI_INTERVAL_MINUTES,
     OI_EXPIRE_MINUTES, OI_USE_WHITELIST, OI_WHITELIST
 )
-from database import redis_client   # ⭕ 写入 Redis
+from database import redis_client, APP_KEYSET   # ⭕ 写入 Redis
 
 OI_KEY = "OI_SYMBOLS"  # Redis 中存放当前 OI 异动币
 oi_records = {}        # 本地仍保留，用于打印 & 过期判断
@@ -28,7 +29,7 @@ async def wait_for_next_period():
 async def fetch_json(session, url, params=None):
     try:
         async with session.get(url, params=params, timeout=10) as r:
-            return await r.json()
+            return await r.json(loads=orjson.loads)
     except:
         return None
 
@@ -97,6 +98,7 @@ async def run_scan():
                     "oi": oi,
                 }
                 redis_client.sadd(OI_KEY, sym)   # ⭕ 写入 Redis，集合去重
+                redis_client.sadd(APP_KEYSET, OI_KEY)
 
         # 清理过期
         for sym in list(oi_records.keys()):
@@ -1,5 +1,6 @@
 import asyncio
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timedelta, timezone
 from config import (
     monitor_symbols,
     mainstream_symbols,
@@ -8,9 +9,9 @@ from config import (
     ALLOW_OPEN_ON_NON_WHITELIST,
     MAX_MONITOR_SYMBOLS,
 )
-from indicators import calculate_signal_single
+from indicators import calculate_signals
 from deepseek_batch_pusher import push_batch_to_deepseek
-from kline_fetcher import fetch_all
+from kline_fetcher import fetch_all_async, cleanup_stale_history
 from ai_trade_notifier import send_tg_trade_signal
 from position_cache import position_records
 from account_positions import get_account_status
@@ -21,9 +22,15 @@ from volume_stats import get_24hr_change
 tf_order = ["1d", "4h", "1h", "15m", "5m"]
 last_trigger = {tf: None for tf in tf_order}
 
+# 所有周期都落在 5 分钟整点上：每轮结束后直接睡到下一个 5 分钟边界，而不是每秒轮询
+TRIGGER_STEP_MIN = 5
+_CLOCK_RES = time.get_clock_info("monotonic").resolution
+
 NEW_OPEN_ACTIONS = {"open_long", "open_short"}
 DEFAULT_OPEN_WHITELIST = set(OPEN_WHITELIST)
 MIN_RR = 1.5
+# 同时下单的币种数上限（兼顾 Binance 限频）
+TRADE_CONCURRENCY = 5
 
 
 def _safe_float(v):
@@ -47,6 +54,33 @@ def _calc_rr(action: str, entry: float, stop_loss: float, take_profit: float):
         return None
     return reward / risk
 
+def _trigger_key(h: int, m: int):
+    if h == 0 and m == 0:
+        return "1d"
+    if h % 4 == 0 and m == 0:
+        return "4h"
+    if m == 0:
+        return "1h"
+    if m % 15 == 0:
+        return "15m"
+    if m % 5 == 0:
+        return "5m"
+    return None
+
+
+# (时, 分) → 本次触发的最大周期，启动时一次性算好，调度循环里只做一次查表
+_TRIGGER_TABLE = {
+    (h, m): key
+    for h in range(24)
+    for m in range(60)
+    if (key := _trigger_key(h, m))
+}
+
+def _seconds_to_next_slot(now: datetime) -> float:
+    base = now.replace(second=0, microsecond=0)
+    nxt = base + timedelta(minutes=TRIGGER_STEP_MIN - base.minute % TRIGGER_STEP_MIN)
+    return (nxt - now).total_seconds() + _CLOCK_RES
+
 def _quote_volume_ok(symbol: str) -> bool:
     if not MIN_QUOTE_VOLUME_USDT:
         return True
@@ -71,25 +105,41 @@ def _allow_new_open(symbol: str, sig: dict) -> bool:
         return False
     return _quote_volume_ok(symbol)
 
+def _flush_trade_pipes(pipes):
+    for pipe in pipes:
+        try:
+            pipe.execute()
+        except Exception as e:
+            print(f"⚠ 交易记录写入失败: {e}")
+
+
+async def _execute_trades(trades):
+    """
+    并发执行下单：下单 / 撤单是阻塞的 HTTP 调用，放到线程里执行，不阻塞事件循环。
+    不同币种并行（最多 TRADE_CONCURRENCY 个），同一币种的多个动作仍按 AI 返回顺序串行，避免互相覆盖 TP/SL。
+    交易记录先写入各币种自己的 pipeline（pipeline 非线程安全，不跨线程共用），全部完成后统一提交。
+    """
+    sem = asyncio.Semaphore(TRADE_CONCURRENCY)
+    by_symbol = {}
+    for kw in trades:
+        by_symbol.setdefault(kw["symbol"], []).append(kw)
+
+    async def run(group):
+        pipe = redis_client.pipeline(transaction=False)
+        async with sem:
+            for kw in group:
+                await asyncio.to_thread(execute_trade, **kw, pipe=pipe)
+        return pipe
+
+    pipes = await asyncio.gather(*(run(group) for group in by_symbol.values()))
+    await asyncio.to_thread(_flush_trade_pipes, pipes)
+
 async def schedule_loop_async():
     print("⏳ 启动最简调度循环（周期触发 → 下载K线 → 投喂AI + 自动交易）")
 
     while True:
         now = datetime.now(timezone.utc)
-        m = now.minute
-        h = now.hour
-        current_key = None
-
-        if h == 0 and m == 0:
-            current_key = "1d"
-        elif h % 4 == 0 and m == 0:
-            current_key = "4h"
-        elif m == 0:
-            current_key = "1h"
-        elif m % 15 == 0:
-            current_key = "15m"
-        elif m % 5 == 0:
-            current_key = "5m"
+        current_key = _TRIGGER_TABLE.get((now.hour, now.minute))
 
         if current_key:
             mark = now.strftime("%Y-%m-%d %H:%M")
@@ -112,11 +162,11 @@ async def schedule_loop_async():
                 print(f"🔍 监控池: {monitor_symbols} (共 {len(monitor_symbols)} 个币)")
 
                 # await asyncio.sleep(2) #等待2秒
-                fetch_all()
+                await fetch_all_async()
 
                 print("📌 所有 K 线下载完成 → 计算指标")
-                for sym in monitor_symbols:
-                    calculate_signal_single(sym)
+                # 指标计算在线程池中进行，不阻塞事件循环
+                await asyncio.to_thread(calculate_signals, list(monitor_symbols))
 
                 try:
                     ai_res = await push_batch_to_deepseek()
@@ -133,6 +183,7 @@ async def schedule_loop_async():
                             "increase_position", "decrease_position"  # ← 新增的
                         }
                         exec_list = []     # 最终需要执行的信号
+                        trades = []        # 对应的 execute_trade 参数
 
                         for sig in ai_res:
                             # print("🔹 AI 信号:", sig)
@@ -171,15 +222,17 @@ async def schedule_loop_async():
 
                             # ---- 仅执行允许的操作 ----
                             if action in valid_actions:
-                                execute_trade(
+                                trades.append(dict(
                                     symbol=symbol,
                                     action=action,
                                     stop_loss=sl,
                                     take_profit=tp,
                                     position_size=position_size
-                                )
+                                ))
                                 exec_list.append(sig)
 
+                        await _execute_trades(trades)
+
                         # 如果真的有执行动作 → 推送 & 日志
                         if exec_list:
                             await send_tg_trade_signal(exec_list)
@@ -191,16 +244,9 @@ async def schedule_loop_async():
 
                 finally:
                     # 🧹 清理 Redis 旧 K线
-                    valid = set(monitor_symbols)
-                    for key in redis_client.keys("historical_data:*"):
-                        k = key if isinstance(key, str) else key.decode()
-                        parts = k.split(":")
-                        if len(parts) == 3:
-                            _, symbol, _ = parts
-                            if symbol not in valid:
-                                redis_client.delete(key)
-                                print(f"🗑 清理无效缓存币: {symbol}")
+                    for symbol in cleanup_stale_history(set(monitor_symbols)):
+                        print(f"🗑 清理无效缓存币: {symbol}")
 
                 print("🎯 本轮调度完成\n")
 
-        await asyncio.sleep(1)
+        await asyncio.sleep(_seconds_to_next_slot(datetime.now(timezone.utc)))
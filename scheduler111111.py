@@ -3,7 +3,7 @@ from datetime import datetime, timezone
 from config import monitor_symbols, mainstream_symbols
 from indicators import calculate_signal_single
 from deepseek_batch_pusher import push_batch_to_deepseek
-from kline_fetcher import fetch_all
+from kline_fetcher import fetch_all, cleanup_stale_history
 from ai_trade_notifier import send_tg_trade_signal
 from position_cache import position_records
 from account_positions import get_account_status
@@ -121,15 +121,8 @@ async def schedule_loop_async():
                     print("⚠ AI 未返回有效信号，不推送，不下单")
 
             finally:
-                valid = set(monitor_symbols)
-                for key in redis_client.keys("historical_data:*"):
-                    k = key if isinstance(key, str) else key.decode()
-                    parts = k.split(":")
-                    if len(parts) == 3:
-                        _, symbol, _ = parts
-                        if symbol not in valid:
-                            redis_client.delete(key)
-                            print(f"🗑 清理无效缓存币: {symbol}")
+                for symbol in cleanup_stale_history(set(monitor_symbols)):
+                    print(f"🗑 清理无效缓存币: {symbol}")
 
             print("🎯 本轮调度完成\n")
 
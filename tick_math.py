@@ -0,0 +1,15 @@
+import math
+
+# 价格 / 数量按 tick、step 取整走整数运算（trader 与 get_main 共用）：
+# step == units / scale，value * scale / units 取整后乘回 units，避免每次构造 Decimal。
+# 与最近整数的相对误差在 TICK_REL_EPS 内视为恰好落在 step/tick 上（吸收 0.29 * 100 = 28.999999999999996）
+TICK_REL_EPS = 1e-15
+
+
+def snap_units(value: float, units: int, scale: int, up: bool = False) -> int:
+    """value 取整到 units/scale 的整数倍（默认向下，up=True 向上），返回以 1/scale 为单位的整数"""
+    x = value * scale / units
+    n = round(x)
+    if abs(x - n) > TICK_REL_EPS * max(1.0, abs(x)):
+        n = math.ceil(x) if up else math.floor(x)
+    return n * units
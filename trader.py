@@ -1,11 +1,15 @@
-from database import redis_client
+from database import redis_client, EXCHANGE_FILTERS_KEY
 import json
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from config import BINANCE_API_KEY, BINANCE_API_SECRET
 from account_positions import get_account_status
+from tick_math import snap_units
 import time
 import math
+import random
+import threading
+import requests
 from decimal import Decimal, ROUND_DOWN, getcontext
 
 # 提高精度，避免浮点误差导致的精度报错
@@ -23,37 +27,127 @@ TP_SL_TYPES = {
     "tp": ["TAKE_PROFIT", "TAKE_PROFIT_MARKET"]
 }
 
-# 缓存交易对精度信息，减少重复请求
-_symbol_info_cache = {}
+# 缓存交易对精度信息：一次 exchange_info 预解析全部合约的 LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL
+# step / tick 同时存为整数形式 (units, scale)，满足 step == units / scale，取整走整数运算
+_symbol_norm_cache = {}
+_symbol_norm_lock = threading.Lock()
+# 各合约 filters 持久化到 Redis，24 小时后过期重新拉取
+EXCHANGE_FILTERS_TTL_SEC = 86400
 
+# 超出 float 可靠位数的精度退回 Decimal 计算
+NORM_FLOAT_DECIMALS = 12
 
-def save_trade_record(record: dict):
-    """保存交易记录"""
-    redis_client.lpush(REDIS_KEY, json.dumps(record))
 
+def save_trade_record(record: dict, pipe=None):
+    """保存交易记录；传入 pipe 时只入队，由调用方统一 execute"""
+    (pipe or redis_client).lpush(REDIS_KEY, json.dumps(record))
 
-def _get_symbol_filters(symbol: str):
-    if symbol not in _symbol_info_cache:
-        info = client.futures_exchange_info()
-        for s in info.get("symbols", []):
-            if s.get("symbol") == symbol:
-                _symbol_info_cache[symbol] = s.get("filters", [])
-                break
-    return _symbol_info_cache.get(symbol, [])
+
+def _units(step: Decimal):
+    """Decimal 步长 → (units, scale, decimals)"""
+    decimals = max(0, -step.as_tuple().exponent)
+    scale = 10 ** decimals
+    return int(step * scale), scale, decimals
+
+
+def _build_norm(step: Decimal, min_qty: Decimal, tick: Decimal, min_notional):
+    step_units, qty_scale, qty_decimals = _units(step)
+    tick_units, price_scale, price_decimals = _units(tick)
+    return {
+        "step": step,
+        "min_qty": min_qty,
+        "tick": tick,
+        "min_notional": min_notional,
+        "step_units": step_units,
+        "qty_scale": qty_scale,
+        "min_qty_f": float(min_qty),
+        "min_qty_units": int(min_qty * qty_scale),
+        "tick_units": tick_units,
+        "price_scale": price_scale,
+        "int_ok": step_units > 0 and tick_units > 0 and max(qty_decimals, price_decimals) <= NORM_FLOAT_DECIMALS,
+    }
+
+
+_DEFAULT_NORM = _build_norm(Decimal("1"), Decimal("0"), Decimal("0.01"), None)
+
+
+def _parse_symbol_norm(filters):
+    step, min_qty, tick, min_notional = Decimal("1"), Decimal("0"), Decimal("0.01"), None
+    for f in filters:
+        ftype = f.get("filterType")
+        if ftype == "LOT_SIZE":
+            step = Decimal(str(f.get("stepSize", "1")))
+            min_qty = Decimal(str(f.get("minQty", "0")))
+        elif ftype == "PRICE_FILTER":
+            tick = Decimal(str(f.get("tickSize", "0.01")))
+        elif ftype == "MIN_NOTIONAL":
+            try:
+                min_notional = float(f["notional"])
+            except Exception:
+                pass
+    return _build_norm(step, min_qty, tick, min_notional)
+
+
+def _fill_symbol_norm(filters_by_symbol):
+    for symbol, filters in filters_by_symbol.items():
+        _symbol_norm_cache[symbol] = _parse_symbol_norm(filters)
+
+
+def _load_cached_filters():
+    """读取 Redis 中持久化的各合约 filters（重启后无需重新下载 exchange_info）"""
+    try:
+        cached = redis_client.get(EXCHANGE_FILTERS_KEY)
+        return json.loads(cached) if cached else {}
+    except Exception:
+        return {}
+
+
+def _fetch_symbol_filters():
+    info = client.futures_exchange_info()
+    filters_by_symbol = {
+        s["symbol"]: s.get("filters", []) for s in info.get("symbols", []) if s.get("symbol")
+    }
+    try:
+        redis_client.set(EXCHANGE_FILTERS_KEY, json.dumps(filters_by_symbol), ex=EXCHANGE_FILTERS_TTL_SEC)
+    except Exception as e:
+        print(f"⚠ 合约精度信息写入 Redis 失败: {e}")
+    return filters_by_symbol
+
+
+def _get_symbol_norm(symbol: str):
+    norm = _symbol_norm_cache.get(symbol)
+    if norm is None:
+        # 加锁：多个线程同时未命中时只有一个去拉取 exchange_info，其余等待后直接读缓存
+        with _symbol_norm_lock:
+            norm = _symbol_norm_cache.get(symbol)
+            if norm is None and not _symbol_norm_cache:
+                _fill_symbol_norm(_load_cached_filters())
+                norm = _symbol_norm_cache.get(symbol)
+            if norm is None:
+                _fill_symbol_norm(_fetch_symbol_filters())
+                # 未知合约不缓存默认值，下次仍会重新拉取（可能是新上线合约）
+                norm = _symbol_norm_cache.get(symbol, _DEFAULT_NORM)
+    return norm
 
 
 def _normalize_qty(symbol: str, qty: float):
     """
     按精度修正数量（向下取整到 stepSize，确保 ≥ minQty），避免 Precision is over the maximum 报错。
     """
-    filters = _get_symbol_filters(symbol)
-    step = Decimal("1")
-    min_qty = Decimal("0")
-    for f in filters:
-        if f.get("filterType") == "LOT_SIZE":
-            step = Decimal(str(f.get("stepSize", "1")))
-            min_qty = Decimal(str(f.get("minQty", "0")))
-            break
+    norm = _get_symbol_norm(symbol)
+    if not norm["int_ok"]:
+        return _normalize_qty_decimal(norm, qty)
+
+    scale = norm["qty_scale"]
+    q = snap_units(max(float(qty), norm["min_qty_f"]), norm["step_units"], scale)
+    if q <= 0:
+        q = norm["min_qty_units"]
+    return q / scale
+
+
+def _normalize_qty_decimal(norm, qty: float):
+    step = norm["step"]
+    min_qty = norm["min_qty"]
 
     qty_dec = Decimal(str(qty))
     if qty_dec < min_qty:
@@ -69,12 +163,16 @@ def _normalize_qty(symbol: str, qty: float):
 
 def _normalize_price(symbol: str, price: float):
     """按 tickSize 修正止盈/止损价格，避免价格精度拒单。"""
-    filters = _get_symbol_filters(symbol)
-    tick = Decimal("0.01")
-    for f in filters:
-        if f.get("filterType") == "PRICE_FILTER":
-            tick = Decimal(str(f.get("tickSize", "0.01")))
-            break
+    norm = _get_symbol_norm(symbol)
+    if not norm["int_ok"]:
+        return _normalize_price_decimal(norm, price)
+
+    scale = norm["price_scale"]
+    return snap_units(float(price), norm["tick_units"], scale) / scale
+
+
+def _normalize_price_decimal(norm, price: float):
+    tick = norm["tick"]
 
     p_dec = Decimal(str(price))
     if tick > 0:
@@ -86,14 +184,8 @@ def _normalize_price(symbol: str, price: float):
 
 def get_min_notional(symbol: str, default=0):
     """最小下单金额"""
-    filters = _get_symbol_filters(symbol)
-    for f in filters:
-        if f.get("filterType") == "MIN_NOTIONAL":
-            try:
-                return float(f.get("notional", default))
-            except Exception:
-                return default
-    return default
+    min_notional = _get_symbol_norm(symbol)["min_notional"]
+    return default if min_notional is None else min_notional
 
 
 def cancel_algo_order(symbol, algoId=None, clientAlgoId=None):
@@ -115,16 +207,68 @@ def cancel_algo_order(symbol, algoId=None, clientAlgoId=None):
 # 下单 TP/SL（独立函数）
 # ===============================
 
+# 限频（-1003 请求过多 / -1015 下单过多）、5xx 与网络抖动视为临时错误，可重试
+RETRY_RATE_LIMIT_CODES = (-1003, -1015)
+
+
+def _is_transient(e):
+    if isinstance(e, BinanceAPIException):
+        return e.code in RETRY_RATE_LIMIT_CODES or (e.status_code or 0) >= 500
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def _with_retry(fn, *args, attempts=3, base=0.2, **kwargs):
+    """
+    临时错误按指数退避 + 随机抖动重试，其余异常直接抛出。
+    只用于幂等的查询（挂单 / 条件单 / 标记价格）；下单超时时订单可能已成交，不能用它重发。
+    """
+    for i in range(attempts):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if i == attempts - 1 or not _is_transient(e):
+                raise
+            time.sleep(base * 2 ** i + random.random() * base)
+
+
+TP_SL_CANCEL_POLLS = 5
+TP_SL_CANCEL_POLL_SEC = 0.1
+
+
+def _tp_sl_types(cancel_sl, cancel_tp):
+    types = []
+    if cancel_sl:
+        types += TP_SL_TYPES["sl"]
+    if cancel_tp:
+        types += TP_SL_TYPES["tp"]
+    return types
+
+
+def _has_open_tp_sl(symbol, position_side, cancel_sl=True, cancel_tp=True):
+    """指定方向是否还挂着对应类型的 TP/SL（基础挂单 + 条件单）；查询失败按已撤销处理"""
+    types = _tp_sl_types(cancel_sl, cancel_tp)
+    if not types:
+        return False
+    try:
+        open_orders = client.futures_get_open_orders(symbol=symbol)
+        algo_orders = client.futures_get_open_orders(symbol=symbol, conditional=True)
+    except Exception:
+        return False
+    return any(
+        o.get("type") in types and o.get("positionSide", position_side) == position_side
+        for o in open_orders
+    ) or any(
+        o.get("orderType") in types and o.get("positionSide", position_side) == position_side
+        for o in algo_orders
+    )
+
+
 def _cancel_tp_sl(symbol, position_side, cancel_sl=True, cancel_tp=True):
     """
     取消指定方向、指定类型的 TP/SL
     支持基础挂单 + 条件单
     """
-    types_to_cancel = []
-    if cancel_sl:
-        types_to_cancel += TP_SL_TYPES["sl"]
-    if cancel_tp:
-        types_to_cancel += TP_SL_TYPES["tp"]
+    types_to_cancel = _tp_sl_types(cancel_sl, cancel_tp)
     if not types_to_cancel:
         return
 
@@ -132,9 +276,9 @@ def _cancel_tp_sl(symbol, position_side, cancel_sl=True, cancel_tp=True):
     # 1️⃣ 取消基础挂单
     # -------------------------------
     try:
-        open_orders = client.futures_get_open_orders(
-            symbol=symbol,
-            requests_params={"timeout": 20}
+        open_orders = _with_retry(
+            client.futures_get_open_orders,
+            symbol=symbol
         )
     except Exception as e:
         print(f"⚠ 获取基础挂单失败: {e}")
@@ -164,10 +308,10 @@ def _cancel_tp_sl(symbol, position_side, cancel_sl=True, cancel_tp=True):
     # 2️⃣ 取消条件单（Algo Order）
     # -------------------------------
     try:
-        algo_orders = client.futures_get_open_orders(
+        algo_orders = _with_retry(
+            client.futures_get_open_orders,
             symbol=symbol,
-            conditional=True,
-            requests_params={"timeout": 20}
+            conditional=True
         )
     except Exception as e:
         print(f"⚠ 获取条件单失败: {e}")
@@ -224,16 +368,6 @@ def _place_tp_sl(symbol, position_side, sl=None, tp=None):
     return results
 
 
-def _with_retry(fn, attempts=3, delay=1, *args, **kwargs):
-    last = None
-    for i in range(attempts):
-        try:
-            return fn(*args, **kwargs)
-        except Exception as e:
-            last = e
-            if i < attempts - 1:
-                time.sleep(delay)
-    raise last
 
 
 def _enforce_breakeven_stop(pos, stop_loss):
@@ -268,14 +402,160 @@ def _update_tp_sl(symbol, position_side, sl=None, tp=None):
     返回订单对象列表
     """
     _cancel_tp_sl(symbol, position_side, cancel_sl=bool(sl), cancel_tp=bool(tp))
-    time.sleep(1)  # 等待 Binance 处理旧订单
+    # 等待 Binance 处理旧订单：轮询确认已撤销即继续，最多约 0.5 秒
+    for _ in range(TP_SL_CANCEL_POLLS):
+        if not _has_open_tp_sl(symbol, position_side, cancel_sl=bool(sl), cancel_tp=bool(tp)):
+            break
+        time.sleep(TP_SL_CANCEL_POLL_SEC)
     return _place_tp_sl(symbol, position_side, sl, tp)
 
+# ===============================
+# 账户快照短时缓存
+# ===============================
+# 同一轮连续执行多个信号时，间隔很短的 execute_trade 复用同一份账户快照；下单成功后立即失效
+ACCOUNT_STATUS_TTL_SEC = 0.5
+# _account_fetch_lock 串行化拉取（并发未命中只请求一次）；_account_lock 保护缓存与代数
+_account_fetch_lock = threading.Lock()
+_account_lock = threading.Lock()
+_account_cached = None  # (monotonic 时间, 快照)
+# 每次下单后 +1：拉取开始后若发生过失效，结果不写回缓存，避免旧快照覆盖失效
+_account_generation = 0
+
+
+def _get_account_status_cached():
+    global _account_cached
+    with _account_fetch_lock:
+        with _account_lock:
+            cached = _account_cached
+            if cached and time.monotonic() - cached[0] < ACCOUNT_STATUS_TTL_SEC:
+                return cached[1]
+            generation = _account_generation
+        acc = get_account_status()
+        with _account_lock:
+            if generation == _account_generation:
+                _account_cached = (time.monotonic(), acc)
+        return acc
+
+
+def _invalidate_account_status():
+    global _account_cached, _account_generation
+    with _account_lock:
+        _account_generation += 1
+        _account_cached = None
+
+
+# ===============================
+# 各动作的执行函数（execute_trade 按 action 查表分发）
+# ===============================
+def _act_open_long(symbol, pos, qty, current, place_order, stop_loss, take_profit):
+    order = place_order(symbol=symbol, side="BUY", positionSide="LONG",
+                        type="MARKET", quantity=qty)
+    _update_tp_sl(symbol, "LONG", sl=stop_loss, tp=take_profit)
+    return order
+
+
+def _act_open_short(symbol, pos, qty, current, place_order, stop_loss, take_profit):
+    order = place_order(symbol=symbol, side="SELL", positionSide="SHORT",
+                        type="MARKET", quantity=qty)
+    _update_tp_sl(symbol, "SHORT", sl=stop_loss, tp=take_profit)
+    return order
+
+
+def _act_close_long(symbol, pos, qty, current, place_order, stop_loss, take_profit):
+    if not pos or pos["size"] <= 0:
+        return None
+    return place_order(symbol=symbol, side="SELL", positionSide="LONG",
+                       type="MARKET", quantity=current)
+
+
+def _act_close_short(symbol, pos, qty, current, place_order, stop_loss, take_profit):
+    if not pos or pos["size"] >= 0:
+        return None
+    return place_order(symbol=symbol, side="BUY", positionSide="SHORT",
+                       type="MARKET", quantity=current)
+
+
+def _act_reverse(symbol, pos, qty, current, place_order, stop_loss, take_profit):
+    if not pos or current <= 0:
+        return None
+    if pos["size"] > 0:  # 平多 → 开空
+        place_order(symbol=symbol, side="SELL", positionSide="LONG",
+                    type="MARKET", quantity=current)
+        order = place_order(symbol=symbol, side="SELL", positionSide="SHORT",
+                            type="MARKET", quantity=qty)
+        _update_tp_sl(symbol, "SHORT", sl=stop_loss, tp=take_profit)
+        return order
+    else:  # 平空 → 开多
+        place_order(symbol=symbol, side="BUY", positionSide="SHORT",
+                    type="MARKET", quantity=current)
+        order = place_order(symbol=symbol, side="BUY", positionSide="LONG",
+                            type="MARKET", quantity=qty)
+        _update_tp_sl(symbol, "LONG", sl=stop_loss, tp=take_profit)
+        return order
+
+
+def _act_increase_position(symbol, pos, qty, current, place_order, stop_loss, take_profit):
+    if not qty:
+        print(f"⚠ {symbol} increase_position 缺少下单数量")
+        return None
+    if pos["size"] > 0:  # 加多
+        return place_order(symbol=symbol, side="BUY", positionSide="LONG",
+                           type="MARKET", quantity=qty)
+    elif pos["size"] < 0:  # 加空
+        return place_order(symbol=symbol, side="SELL", positionSide="SHORT",
+                           type="MARKET", quantity=qty)
+
+
+def _act_decrease_position(symbol, pos, qty, current, place_order, stop_loss, take_profit):
+    if not pos:
+        return None
+    reduce_qty = qty if qty else current / 2
+    reduce_qty = min(reduce_qty, current)
+    if pos["size"] > 0:  # 减多
+        return place_order(symbol=symbol, side="SELL", positionSide="LONG",
+                           type="MARKET", quantity=reduce_qty)
+    elif pos["size"] < 0:  # 减空
+        return place_order(symbol=symbol, side="BUY", positionSide="SHORT",
+                           type="MARKET", quantity=reduce_qty)
+
+
+def _act_update_stop_loss(symbol, pos, qty, current, place_order, stop_loss, take_profit):
+    if pos:
+        side = "LONG" if pos["size"] > 0 else "SHORT"
+        orders = _update_tp_sl(symbol, side, sl=stop_loss, tp=None)
+        return orders if orders else None
+    return None
+
+
+def _act_update_take_profit(symbol, pos, qty, current, place_order, stop_loss, take_profit):
+    if pos:
+        side = "LONG" if pos["size"] > 0 else "SHORT"
+        orders = _update_tp_sl(symbol, side, sl=None, tp=take_profit)
+        return orders if orders else None
+    return None
+
+
+# 会用到新下单数量 qty 的动作（reverse 的开仓腿、decrease_position 的指定减仓量）
+QTY_ACTIONS = {"open_long", "open_short", "reverse", "increase_position", "decrease_position"}
+
+_ACTION_HANDLERS = {
+    "open_long": _act_open_long,
+    "open_short": _act_open_short,
+    "close_long": _act_close_long,
+    "close_short": _act_close_short,
+    "reverse": _act_reverse,
+    "increase_position": _act_increase_position,
+    "decrease_position": _act_decrease_position,
+    "update_stop_loss": _act_update_stop_loss,
+    "update_take_profit": _act_update_take_profit,
+}
+
+
 # ===============================
 # 主交易执行
 # ===============================
 def execute_trade(symbol: str, action: str, stop_loss=None, take_profit=None,
-                  quantity=None, position_size=None):
+                  quantity=None, position_size=None, pipe=None):
     """
     执行交易函数（不使用杠杆）
     - symbol: 交易对
@@ -284,18 +564,18 @@ def execute_trade(symbol: str, action: str, stop_loss=None, take_profit=None,
     - stop_loss / take_profit: 止损/止盈价格
     - quantity: 指定合约数量
     - position_size: 指定 USDT 金额（会自动换算成合约数量）
+    - pipe: 可选 Redis pipeline，交易记录写入其中，批量执行时一次提交
     """
     try:
         # 获取当前持仓和标记价格（带重试）
-        acc = get_account_status()
+        acc = _get_account_status_cached()
         pos = next((p for p in acc["positions"] if p["symbol"] == symbol), None)
         if pos:
             mark = float(pos["mark_price"])
         else:
             mark_price = _with_retry(
-                client.futures_mark_price, 3, 1,
-                symbol=symbol,
-                requests_params={"timeout": 20}
+                client.futures_mark_price,
+                symbol=symbol
             )
             mark = float(mark_price["markPrice"])
 
@@ -313,7 +593,8 @@ def execute_trade(symbol: str, action: str, stop_loss=None, take_profit=None,
                 print(f"⚠ {symbol} 缺少 position_size 或 quantity，无法执行开仓/加仓")
                 return None
 
-        if qty:
+        # 平仓 / 改 TP/SL 只用现有持仓数量，不需要对 qty 做精度与最小金额处理
+        if qty and action in QTY_ACTIONS:
             # 精度修正
             qty = _normalize_qty(symbol, qty)
 
@@ -327,9 +608,10 @@ def execute_trade(symbol: str, action: str, stop_loss=None, take_profit=None,
 
         # 下单函数
         def place_order(**kwargs):
-            kwargs = dict(kwargs)
-            kwargs.setdefault("requests_params", {"timeout": 20})
-            order = _with_retry(client.futures_create_order, 3, 1, **kwargs)
+            # 下单不重试：超时 / 5xx 时 Binance 可能已受理，重发会重复开仓
+            order = client.futures_create_order(**kwargs)
+            # 持仓已变化，下一次 execute_trade 必须重新拉取账户
+            _invalidate_account_status()
             save_trade_record({
                 "symbol": symbol,
                 "action": action,
@@ -337,92 +619,16 @@ def execute_trade(symbol: str, action: str, stop_loss=None, take_profit=None,
                 "price": mark,
                 "quantity": kwargs.get("quantity"),
                 "status": order.get("status")
-            })
+            }, pipe)
             return order
 
         # 执行动作
-        if action == "open_long":
-            order = place_order(symbol=symbol, side="BUY", positionSide="LONG",
-                                type="MARKET", quantity=qty)
-            _update_tp_sl(symbol, "LONG", sl=stop_loss, tp=take_profit)
-            return order
-
-        elif action == "open_short":
-            order = place_order(symbol=symbol, side="SELL", positionSide="SHORT",
-                                type="MARKET", quantity=qty)
-            _update_tp_sl(symbol, "SHORT", sl=stop_loss, tp=take_profit)
-            return order
-
-        elif action == "close_long":
-            if not pos or pos["size"] <= 0:
-                return None
-            return place_order(symbol=symbol, side="SELL", positionSide="LONG",
-                               type="MARKET", quantity=current)
-
-        elif action == "close_short":
-            if not pos or pos["size"] >= 0:
-                return None
-            return place_order(symbol=symbol, side="BUY", positionSide="SHORT",
-                               type="MARKET", quantity=current)
-
-        elif action == "reverse":
-            if not pos or current <= 0:
-                return None
-            if pos["size"] > 0:  # 平多 → 开空
-                place_order(symbol=symbol, side="SELL", positionSide="LONG",
-                            type="MARKET", quantity=current)
-                order = place_order(symbol=symbol, side="SELL", positionSide="SHORT",
-                                    type="MARKET", quantity=qty)
-                _update_tp_sl(symbol, "SHORT", sl=stop_loss, tp=take_profit)
-                return order
-            else:  # 平空 → 开多
-                place_order(symbol=symbol, side="BUY", positionSide="SHORT",
-                            type="MARKET", quantity=current)
-                order = place_order(symbol=symbol, side="BUY", positionSide="LONG",
-                                    type="MARKET", quantity=qty)
-                _update_tp_sl(symbol, "LONG", sl=stop_loss, tp=take_profit)
-                return order
-
-        elif action == "increase_position":
-            if not qty:
-                print(f"⚠ {symbol} increase_position 缺少下单数量")
-                return None
-            if pos["size"] > 0:  # 加多
-                return place_order(symbol=symbol, side="BUY", positionSide="LONG",
-                                   type="MARKET", quantity=qty)
-            elif pos["size"] < 0:  # 加空
-                return place_order(symbol=symbol, side="SELL", positionSide="SHORT",
-                                   type="MARKET", quantity=qty)
-
-        elif action == "decrease_position":
-            if not pos:
-                return None
-            reduce_qty = qty if qty else current / 2
-            reduce_qty = min(reduce_qty, current)
-            if pos["size"] > 0:  # 减多
-                return place_order(symbol=symbol, side="SELL", positionSide="LONG",
-                                   type="MARKET", quantity=reduce_qty)
-            elif pos["size"] < 0:  # 减空
-                return place_order(symbol=symbol, side="BUY", positionSide="SHORT",
-                                   type="MARKET", quantity=reduce_qty)
-
-        elif action == "update_stop_loss":
-            if pos:
-                side = "LONG" if pos["size"] > 0 else "SHORT"
-                orders = _update_tp_sl(symbol, side, sl=stop_loss, tp=None)
-                return orders if orders else None
-            return None
-
-        elif action == "update_take_profit":
-            if pos:
-                side = "LONG" if pos["size"] > 0 else "SHORT"
-                orders = _update_tp_sl(symbol, side, sl=None, tp=take_profit)
-                return orders if orders else None
-            return None
-
-        else:
+        handler = _ACTION_HANDLERS.get(action)
+        if handler is None:
             print(f"⚠ 未识别动作: {action}")
             return None
+        return handler(symbol, pos, qty, current, place_order, stop_loss, take_profit)
+
 
     except BinanceAPIException as e:
         print(f"❌ Binance 下单异常 → {symbol}: {e}")
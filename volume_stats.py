@@ -1,9 +1,17 @@
-import json
-import time
+import asyncio
+import bisect
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 from database import redis_client
+from kline_fetcher import decode_kline
 from config import OI_BASE_URL as BASE
 import math
+import threading
+from cachetools import TTLCache
+import numpy as np
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 logging.basicConfig(
@@ -14,40 +22,56 @@ logging.basicConfig(
 # =========================
 # 🔗 URL mapping
 # =========================
+# 模板用 % 占位：每次请求直接 % 替换，比 str.format 解析关键字参数更省
 URLS = {
-    "OPEN_INTEREST": BASE + "/fapi/v1/openInterest?symbol={symbol}",
-    "FUNDING_RATE": BASE + "/fapi/v1/premiumIndex?symbol={symbol}",
-    "TICKER_24HR": BASE + "/fapi/v1/ticker/24hr?symbol={symbol}",
-    "OI_HISTORY": BASE + "/futures/data/openInterestHist?symbol={symbol}&period={period}&limit={limit}",
-    "TOP_POS_RATIO": BASE + "/futures/data/topLongShortPositionRatio?symbol={symbol}&period={period}&limit={limit}",
-    "TOP_ACC_RATIO": BASE + "/futures/data/topLongShortAccountRatio?symbol={symbol}&period={period}&limit={limit}",
-    "GLOBAL_ACC_RATIO": BASE + "/futures/data/globalLongShortAccountRatio?symbol={symbol}&period={period}&limit={limit}",
+    "OPEN_INTEREST": BASE + "/fapi/v1/openInterest?symbol=%s",
+    "FUNDING_RATE": BASE + "/fapi/v1/premiumIndex?symbol=%s",
+    "TICKER_24HR": BASE + "/fapi/v1/ticker/24hr?symbol=%s",
+    "OI_HISTORY": BASE + "/futures/data/openInterestHist?symbol=%s&period=%s&limit=%s",
+    "TOP_POS_RATIO": BASE + "/futures/data/topLongShortPositionRatio?symbol=%s&period=%s&limit=%s",
+    "TOP_ACC_RATIO": BASE + "/futures/data/topLongShortAccountRatio?symbol=%s&period=%s&limit=%s",
+    "GLOBAL_ACC_RATIO": BASE + "/futures/data/globalLongShortAccountRatio?symbol=%s&period=%s&limit=%s",
+    # 不带 symbol：一次返回全部合约
+    "FUNDING_RATE_ALL": BASE + "/fapi/v1/premiumIndex",
+    "TICKER_24HR_ALL": BASE + "/fapi/v1/ticker/24hr",
 }
 
 VOLUME_INTERVALS = ["5m", "15m", "1h", "4h", "1d"]
 
+# 同步接口共用一个 Session：到 Binance 的 TCP / TLS 连接保持复用，不再每次请求重新握手
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=64))
+
+# 同一币种的 6 个情绪接口互不依赖，用常驻线程池并发请求
+_sentiment_exec = ThreadPoolExecutor(max_workers=8, thread_name_prefix="sentiment")
+
 # =========================
 # 🔐 Cache system
 # =========================
+# 每组一个 TTLCache：过期由缓存自身处理，容量有上限，不会随币种数量无限增长
+# 带周期的接口（OI 历史 / 多空比）以 (symbol, period, limit) 元组为键，免去每次拼接字符串
+CACHE_MAXSIZE = 4096
 _cached = {
-    "oi": {},
-    "funding": {},
-    "24hr": {},
-    "oi_hist": {},
-    "top_pos": {},
-    "top_acc": {},
-    "global_acc": {},
+    "oi": TTLCache(CACHE_MAXSIZE, ttl=60),
+    "funding": TTLCache(CACHE_MAXSIZE, ttl=60),
+    "24hr": TTLCache(CACHE_MAXSIZE, ttl=60),
+    "oi_hist": TTLCache(CACHE_MAXSIZE, ttl=120),
+    "top_pos": TTLCache(CACHE_MAXSIZE, ttl=120),
+    "top_acc": TTLCache(CACHE_MAXSIZE, ttl=120),
+    "global_acc": TTLCache(CACHE_MAXSIZE, ttl=120),
 }
+# TTLCache 非线程安全（读取时也可能清理过期项），情绪接口在线程池中并发访问
+_cache_lock = threading.Lock()
 
 
-def _cache_get(group, key, ttl):
-    now = time.time()
-    item = _cached[group].get(key)
-    return item["value"] if item and now - item["ts"] < ttl else None
+def _cache_get(group, key):
+    with _cache_lock:
+        return _cached[group].get(key)
 
 
 def _cache_set(group, key, value):
-    _cached[group][key] = {"value": value, "ts": time.time()}
+    with _cache_lock:
+        _cached[group][key] = value
 
 
 # =========================
@@ -55,22 +79,38 @@ def _cache_set(group, key, value):
 # =========================
 def load_klines(symbol, interval, limit=100):
     key = f"historical_data:{symbol}:{interval}"
-    raw = redis_client.hgetall(key)
-    if not raw:
-        return []
+    # 有序集合按时间戳排列，直接取最后 limit 根
+    return [decode_kline(v) for v in redis_client.zrange(key, -limit, -1)]
+
 
-    items = sorted(raw.items(), key=lambda x: int(x[0]))
-    return [json.loads(v) for _, v in items][-limit:]
+def load_klines_many(pairs, limit=100):
+    """一次 pipeline 批量读取多组 (symbol, interval) 的 K 线"""
+    pairs = list(pairs)
+    pipe = redis_client.pipeline()
+    for symbol, interval in pairs:
+        pipe.zrange(f"historical_data:{symbol}:{interval}", -limit, -1)
+    return {pair: [decode_kline(v) for v in raw] for pair, raw in zip(pairs, pipe.execute())}
 
 
 def calc_volume_compare(klines):
     if not klines:
         return None
-
     sub = klines[-100:]
-    vols = [float(k.get("Volume", 0)) for k in sub]
-    avg = sum(vols) / len(vols) if vols else 0
-    cur = vols[-1] if vols else 0
+    return _volume_compare(np.fromiter((k.get("Volume", 0) for k in sub), dtype=np.float64, count=len(sub)))
+
+
+def calc_volume_compare_values(volumes):
+    """同 calc_volume_compare，直接接收成交量数组（如 batch 中已按列存好的 Volume）"""
+    vols = volumes[-100:]
+    if not len(vols):
+        return None
+    return _volume_compare(np.asarray(vols, dtype=np.float64))
+
+
+def _volume_compare(vols):
+    # 均值在 numpy 中一次归约完成，不再逐个 float() + sum()
+    avg = float(vols.mean())
+    cur = float(vols[-1])
 
     return {
         "current_volume": round(cur, 2),
@@ -81,15 +121,52 @@ def calc_volume_compare(klines):
 # =========================
 # 📌 Core API Wrappers
 # =========================
+def _parse_open_interest(data):
+    return float(data.get("openInterest"))
+
+
+def _parse_funding_rate(data):
+    return float(data.get("lastFundingRate"))
+
+
+def _parse_24hr(j):
+    return {
+        "priceChange": float(j.get("priceChange", 0)),
+        "priceChangePercent": float(j.get("priceChangePercent", 0)),
+        "lastPrice": float(j.get("lastPrice", 0)),
+        "highPrice": float(j.get("highPrice", 0)),
+        "lowPrice": float(j.get("lowPrice", 0)),
+        "volume": float(j.get("volume", 0)),
+        "quoteVolume": float(j.get("quoteVolume", 0)),
+    }
+
+
+def _parse_oi_history(raw):
+    return [{
+        "timestamp": int(i["timestamp"]),
+        "openInterest": float(i["sumOpenInterest"]),
+        "openInterestValue": float(i["sumOpenInterestValue"]),
+    } for i in raw]
+
+
+def _parse_lsr(raw):
+    return [{
+        "timestamp": int(i["timestamp"]),
+        "ratio": float(i["longShortRatio"]),
+        "long": float(i["longAccount"]),
+        "short": float(i["shortAccount"]),
+    } for i in raw]
+
+
 def get_open_interest(symbol):
     key = symbol
-    cached = _cache_get("oi", key, ttl=60)
+    cached = _cache_get("oi", key)
     if cached is not None:
         return cached
 
     try:
-        data = requests.get(URLS["OPEN_INTEREST"].format(symbol=symbol), timeout=5).json()
-        value = float(data.get("openInterest"))
+        data = orjson.loads(_http.get(URLS["OPEN_INTEREST"] % symbol, timeout=5).content)
+        value = _parse_open_interest(data)
     except Exception:
         value = None
 
@@ -98,13 +175,13 @@ def get_open_interest(symbol):
 
 def get_funding_rate(symbol):
     key = symbol
-    cached = _cache_get("funding", key, ttl=60)
+    cached = _cache_get("funding", key)
     if cached is not None:
         return cached
 
     try:
-        data = requests.get(URLS["FUNDING_RATE"].format(symbol=symbol), timeout=5).json()
-        value = float(data.get("lastFundingRate"))
+        data = orjson.loads(_http.get(URLS["FUNDING_RATE"] % symbol, timeout=5).content)
+        value = _parse_funding_rate(data)
     except Exception:
         value = None
 
@@ -113,21 +190,13 @@ def get_funding_rate(symbol):
 
 def get_24hr_change(symbol):
     key = symbol
-    cached = _cache_get("24hr", key, ttl=60)
+    cached = _cache_get("24hr", key)
     if cached is not None:
         return cached
 
     try:
-        j = requests.get(URLS["TICKER_24HR"].format(symbol=symbol), timeout=5).json()
-        result = {
-            "priceChange": float(j.get("priceChange", 0)),
-            "priceChangePercent": float(j.get("priceChangePercent", 0)),
-            "lastPrice": float(j.get("lastPrice", 0)),
-            "highPrice": float(j.get("highPrice", 0)),
-            "lowPrice": float(j.get("lowPrice", 0)),
-            "volume": float(j.get("volume", 0)),
-            "quoteVolume": float(j.get("quoteVolume", 0)),
-        }
+        j = orjson.loads(_http.get(URLS["TICKER_24HR"] % symbol, timeout=5).content)
+        result = _parse_24hr(j)
     except Exception:
         result = None
 
@@ -138,18 +207,14 @@ def get_24hr_change(symbol):
 # 📈 OI History
 # =========================
 def get_oi_history(symbol, period="1h", limit=10):
-    key = f"{symbol}_{period}_{limit}"
-    cached = _cache_get("oi_hist", key, ttl=120)
+    key = (symbol, period, limit)
+    cached = _cache_get("oi_hist", key)
     if cached is not None:
         return cached
 
     try:
-        raw = requests.get(URLS["OI_HISTORY"].format(symbol=symbol, period=period, limit=limit), timeout=6).json()
-        result = [{
-            "timestamp": int(i["timestamp"]),
-            "openInterest": float(i["sumOpenInterest"]),
-            "openInterestValue": float(i["sumOpenInterestValue"]),
-        } for i in raw]
+        raw = orjson.loads(_http.get(URLS["OI_HISTORY"] % (symbol, period, limit), timeout=6).content)
+        result = _parse_oi_history(raw)
     except Exception:
         result = None
 
@@ -160,22 +225,17 @@ def get_oi_history(symbol, period="1h", limit=10):
 # 🦈 Big player / global long-short ratios
 # =========================
 def _fetch_lsr(group, url_key, symbol, period, limit):
-    key = f"{symbol}_{period}_{limit}"
-    cached = _cache_get(group, key, ttl=120)
+    key = (symbol, period, limit)
+    cached = _cache_get(group, key)
     if cached is not None:
         return cached
 
     try:
-        raw = requests.get(
-            URLS[url_key].format(symbol=symbol, period=period, limit=limit),
+        raw = orjson.loads(_http.get(
+            URLS[url_key] % (symbol, period, limit),
             timeout=6
-        ).json()
-        result = [{
-            "timestamp": int(i["timestamp"]),
-            "ratio": float(i["longShortRatio"]),
-            "long": float(i["longAccount"]),
-            "short": float(i["shortAccount"]),
-        } for i in raw]
+        ).content)
+        result = _parse_lsr(raw)
     except Exception:
         result = None
 
@@ -191,6 +251,89 @@ def get_top_account_ratio(symbol, period="1h", limit=30):
 def get_global_account_ratio(symbol, period="1h", limit=30):
     return _fetch_lsr("global_acc", "GLOBAL_ACC_RATIO", symbol, period, limit)
 
+# =========================
+# ⚡ Async API Wrappers（共享 aiohttp.ClientSession，与同步版共用缓存）
+# =========================
+async def _get_json_async(session, url, timeout):
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+        return await r.json(content_type=None, loads=orjson.loads)
+
+
+async def _cached_fetch_async(session, group, key, url, timeout, parse):
+    cached = _cache_get(group, key)
+    if cached is not None:
+        return cached
+
+    try:
+        value = parse(await _get_json_async(session, url, timeout))
+    except Exception:
+        value = None
+
+    _cache_set(group, key, value)
+    return value
+
+
+def _fill_cache_bulk(group, rows, parse):
+    """全市场接口返回的数组按 symbol 批量写入缓存"""
+    with _cache_lock:
+        cache = _cached[group]
+        for row in rows:
+            try:
+                cache[row["symbol"]] = parse(row)
+            except Exception:
+                continue
+
+
+async def refresh_market_snapshot_async(session):
+    """
+    一次请求拉取全部合约的资金费率与 24h 行情并写入缓存，
+    之后各币种的 get_funding_rate / get_24hr_change 直接命中缓存，不再逐个请求
+    """
+    funding, tickers = await asyncio.gather(
+        _get_json_async(session, URLS["FUNDING_RATE_ALL"], 5),
+        _get_json_async(session, URLS["TICKER_24HR_ALL"], 5),
+        return_exceptions=True,
+    )
+    if isinstance(funding, list):
+        _fill_cache_bulk("funding", funding, _parse_funding_rate)
+    if isinstance(tickers, list):
+        _fill_cache_bulk("24hr", tickers, _parse_24hr)
+
+
+async def get_open_interest_async(session, symbol):
+    return await _cached_fetch_async(
+        session, "oi", symbol,
+        URLS["OPEN_INTEREST"] % symbol, 5, _parse_open_interest)
+
+async def get_funding_rate_async(session, symbol):
+    return await _cached_fetch_async(
+        session, "funding", symbol,
+        URLS["FUNDING_RATE"] % symbol, 5, _parse_funding_rate)
+
+async def get_24hr_change_async(session, symbol):
+    return await _cached_fetch_async(
+        session, "24hr", symbol,
+        URLS["TICKER_24HR"] % symbol, 5, _parse_24hr)
+
+async def get_oi_history_async(session, symbol, period="1h", limit=10):
+    return await _cached_fetch_async(
+        session, "oi_hist", (symbol, period, limit),
+        URLS["OI_HISTORY"] % (symbol, period, limit), 6, _parse_oi_history)
+
+async def _fetch_lsr_async(session, group, url_key, symbol, period, limit):
+    return await _cached_fetch_async(
+        session, group, (symbol, period, limit),
+        URLS[url_key] % (symbol, period, limit), 6, _parse_lsr)
+
+async def get_top_position_ratio_async(session, symbol, period="1h", limit=30):
+    return await _fetch_lsr_async(session, "top_pos", "TOP_POS_RATIO", symbol, period, limit)
+
+async def get_top_account_ratio_async(session, symbol, period="1h", limit=30):
+    return await _fetch_lsr_async(session, "top_acc", "TOP_ACC_RATIO", symbol, period, limit)
+
+async def get_global_account_ratio_async(session, symbol, period="1h", limit=30):
+    return await _fetch_lsr_async(session, "global_acc", "GLOBAL_ACC_RATIO", symbol, period, limit)
+
 # =========================
 # 🎯 Normalization helpers
 # =========================
@@ -210,114 +353,159 @@ def normalize_inverse(value, min_v, max_v):
 # =========================
 # 💡 Smart Sentiment Score
 # =========================
+# 多空比自适应回看根数 (N bars)
+SENTIMENT_LOOKBACK = {"5m": 20, "15m": 12, "1h": 5, "4h": 3, "1d": 2}
+
+# ===== Weights by timeframe ===== #
+SENTIMENT_WEIGHTS = {
+    "5m":  {"oi":0.1,"fund":0.2,"big":0.2,"big_acc":0.1,"retail":0.2,"vol":0.2},
+    "15m": {"oi":0.15,"fund":0.2,"big":0.25,"big_acc":0.1,"retail":0.2,"vol":0.1},
+    "1h":  {"oi":0.2,"fund":0.2,"big":0.25,"big_acc":0.1,"retail":0.15,"vol":0.1},
+    "4h":  {"oi":0.25,"fund":0.15,"big":0.3,"big_acc":0.1,"retail":0.2,"vol":0.0},
+    "1d":  {"oi":0.3,"fund":0.1,"big":0.35,"big_acc":0.1,"retail":0.2,"vol":0.0},
+}
+# 导入时按因子顺序展开成元组，评分时直接与因子逐项相乘累加
+SENTIMENT_FACTOR_ORDER = ("oi", "fund", "big", "big_acc", "retail", "vol")
+SENTIMENT_WEIGHT_ROWS = {
+    iv: tuple(w[k] for k in SENTIMENT_FACTOR_ORDER) for iv, w in SENTIMENT_WEIGHTS.items()
+}
+
+# ===== Strategy tag ===== #
+# 分数 ≥ 各阈值即进入下一档：bisect_right 得到档位下标
+SENTIMENT_TAG_CUTS = (25, 45, 65, 85)
+SENTIMENT_TAGS = ("🔴 Strong Short", "🔵 Short Bias", "⚪ Neutral", "🟡 Long Bias", "🟢 Strong Long")
+
+
+def _sentiment_fallback(symbol, interval):
+    return {
+        "symbol": symbol,
+        "interval": interval,
+        "sentiment_score": 50,
+        "tag": "⚪ Neutral",
+        "factors": {
+            "open_interest": 0,
+            "funding_rate": 0,
+            "big_whales": 0,
+            "big_accounts": 0,
+            "retail_inverse": 0,
+            "volume_emotion": 0,
+        }
+    }
+
+
+def _field_array(items, field):
+    return np.fromiter((x[field] for x in items), dtype=np.float64, count=len(items))
+
+
+def _field_mean(items, field):
+    """列表中某字段的均值；空列表返回 None"""
+    return float(_field_array(items, field).mean()) if items else None
+
+
+def _score_sentiment(symbol, interval, kl, cur_oi, funding, top_pos, top_acc, global_acc, oi_hist):
+    """根据已拉取的数据计算情绪评分（纯计算，不发请求）"""
+    if not kl:
+        raise ValueError("Kline data missing")
+
+    volume = calc_volume_compare(kl)
+
+    # ===== Average over lookback for smoothing ===== #
+    top_pos_val = _field_mean(top_pos, "ratio")
+    top_acc_val = _field_mean(top_acc, "ratio")
+    global_val = _field_mean(global_acc, "ratio")
+    vol_ratio = volume["ratio"] if volume else 1.0
+
+    # ===== OI NORMALIZED ===== #
+    if oi_hist:
+        oi_values = _field_array(oi_hist, "openInterest")
+        min_oi = float(oi_values.min())
+        max_oi = float(oi_values.max())
+        if max_oi == min_oi:
+            oi_score = 0.5
+        else:
+            oi_score = normalize(cur_oi, min_oi, max_oi)
+    else:
+        oi_score = 0.5
+
+    # ===== Normalized scores ===== #
+    funding_score = normalize(funding, -0.02, 0.02) if funding is not None else 0  # 保留方向
+    big_player_score = normalize(top_pos_val, 0.9, 2.0) if top_pos_val else 0
+    big_account_score = normalize(top_acc_val, 0.9, 2.0) if top_acc_val else 0
+    crowd_inverse_score = normalize_inverse(global_val, 0.8, 1.2) if global_val else 0
+    volume_score = normalize(vol_ratio, 0.5, 3.0) if volume else 0
+
+    # ===== Final sentiment score ===== #
+    factors = (oi_score, funding_score, big_player_score, big_account_score, crowd_inverse_score, volume_score)
+    weights = SENTIMENT_WEIGHT_ROWS.get(interval, SENTIMENT_WEIGHT_ROWS["1h"])
+    score = sum(w * f for w, f in zip(weights, factors))
+    score_100 = int(max(0, min(100, score * 100)))
+
+    # ===== Strategy tag ===== #
+    sentiment_tag = SENTIMENT_TAGS[bisect.bisect_right(SENTIMENT_TAG_CUTS, score_100)]
+
+    return {
+        "symbol": symbol,
+        "interval": interval,
+        "sentiment_score": score_100,
+        "tag": sentiment_tag,
+        "factors": {
+            "open_interest": round(oi_score, 3),
+            "funding_rate": round(funding_score, 3),
+            "big_whales": round(big_player_score, 3),
+            "big_accounts": round(big_account_score, 3),
+            "retail_inverse": round(crowd_inverse_score, 3),
+            "volume_emotion": round(volume_score, 3),
+        }
+    }
+
+
 def calc_smart_sentiment(symbol, interval):
     """Multi-timeframe smart sentiment with adaptive lookback for top/global ratios"""
     try:
-        # ===== Load Kline data ===== #
         kl = load_klines(symbol, interval)
         if not kl:
             raise ValueError("Kline data missing")
 
-        volume = calc_volume_compare(kl)
-        cur_oi = get_open_interest(symbol)
-        funding = get_funding_rate(symbol)
-
-        # ===== Adaptive lookback (N bars) ===== #
-        lookback_map = {"5m": 20, "15m": 12, "1h": 5, "4h": 3, "1d": 2}
-        N = lookback_map.get(interval, 3)
-
-        # ===== Fetch top/global ratios with lookback ===== #
-        top_pos = get_top_position_ratio(symbol, interval, N)
-        top_acc = get_top_account_ratio(symbol, interval, N)
-        global_acc = get_global_account_ratio(symbol, interval, N)
-
-        # ===== Average over lookback for smoothing ===== #
-        top_pos_val = sum([x["ratio"] for x in top_pos]) / len(top_pos) if top_pos else None
-        top_acc_val = sum([x["ratio"] for x in top_acc]) / len(top_acc) if top_acc else None
-        global_val = sum([x["ratio"] for x in global_acc]) / len(global_acc) if global_acc else None
-        vol_ratio = volume["ratio"] if volume else 1.0
-
-        # ===== OI NORMALIZED ===== #
-        oi_hist = get_oi_history(symbol, "1h", limit=10)
-        if oi_hist:
-            oi_values = [x["openInterest"] for x in oi_hist]
-            min_oi = min(oi_values)
-            max_oi = max(oi_values)
-            if max_oi == min_oi:
-                oi_score = 0.5
-            else:
-                oi_score = normalize(cur_oi, min_oi, max_oi)
-        else:
-            oi_score = 0.5
+        N = SENTIMENT_LOOKBACK.get(interval, 3)
+        submit = _sentiment_exec.submit
+        f_oi = submit(get_open_interest, symbol)
+        f_funding = submit(get_funding_rate, symbol)
+        f_top_pos = submit(get_top_position_ratio, symbol, interval, N)
+        f_top_acc = submit(get_top_account_ratio, symbol, interval, N)
+        f_global_acc = submit(get_global_account_ratio, symbol, interval, N)
+        f_oi_hist = submit(get_oi_history, symbol, "1h", limit=10)
+        return _score_sentiment(
+            symbol, interval, kl,
+            cur_oi=f_oi.result(),
+            funding=f_funding.result(),
+            top_pos=f_top_pos.result(),
+            top_acc=f_top_acc.result(),
+            global_acc=f_global_acc.result(),
+            oi_hist=f_oi_hist.result(),
+        )
 
-        # ===== Normalized scores ===== #
-        funding_score = normalize(funding, -0.02, 0.02) if funding is not None else 0  # 保留方向
-        big_player_score = normalize(top_pos_val, 0.9, 2.0) if top_pos_val else 0
-        big_account_score = normalize(top_acc_val, 0.9, 2.0) if top_acc_val else 0
-        crowd_inverse_score = normalize_inverse(global_val, 0.8, 1.2) if global_val else 0
-        volume_score = normalize(vol_ratio, 0.5, 3.0) if volume else 0
-
-        # ===== Weights by timeframe ===== #
-        weights_map = {
-            "5m":  {"oi":0.1,"fund":0.2,"big":0.2,"big_acc":0.1,"retail":0.2,"vol":0.2},
-            "15m": {"oi":0.15,"fund":0.2,"big":0.25,"big_acc":0.1,"retail":0.2,"vol":0.1},
-            "1h":  {"oi":0.2,"fund":0.2,"big":0.25,"big_acc":0.1,"retail":0.15,"vol":0.1},
-            "4h":  {"oi":0.25,"fund":0.15,"big":0.3,"big_acc":0.1,"retail":0.2,"vol":0.0},
-            "1d":  {"oi":0.3,"fund":0.1,"big":0.35,"big_acc":0.1,"retail":0.2,"vol":0.0},
-        }
-        weights = weights_map.get(interval, weights_map["1h"])
-
-        # ===== Final sentiment score ===== #
-        score = (
-            weights["oi"] * oi_score +
-            weights["fund"] * funding_score +
-            weights["big"] * big_player_score +
-            weights["big_acc"] * big_account_score +
-            weights["retail"] * crowd_inverse_score +
-            weights["vol"] * volume_score
+    except Exception as e:
+        logging.error(f"Sentiment calc error: {e}")
+        return _sentiment_fallback(symbol, interval)
+
+
+async def calc_smart_sentiment_async(session, symbol, interval, kl):
+    """异步版情绪评分：K 线由调用方批量读取后传入，其余接口共享 session 并发拉取"""
+    try:
+        if not kl:
+            raise ValueError("Kline data missing")
+
+        N = SENTIMENT_LOOKBACK.get(interval, 3)
+        cur_oi, funding, top_pos, top_acc, global_acc, oi_hist = await asyncio.gather(
+            get_open_interest_async(session, symbol),
+            get_funding_rate_async(session, symbol),
+            get_top_position_ratio_async(session, symbol, interval, N),
+            get_top_account_ratio_async(session, symbol, interval, N),
+            get_global_account_ratio_async(session, symbol, interval, N),
+            get_oi_history_async(session, symbol, "1h", 10),
         )
-        score_100 = int(max(0, min(100, score * 100)))
-
-        # ===== Strategy tag ===== #
-        if score_100 >= 85:
-            sentiment_tag = "🟢 Strong Long"
-        elif score_100 >= 65:
-            sentiment_tag = "🟡 Long Bias"
-        elif score_100 >= 45:
-            sentiment_tag = "⚪ Neutral"
-        elif score_100 >= 25:
-            sentiment_tag = "🔵 Short Bias"
-        else:
-            sentiment_tag = "🔴 Strong Short"
-
-        return {
-            "symbol": symbol,
-            "interval": interval,
-            "sentiment_score": score_100,
-            "tag": sentiment_tag,
-            "factors": {
-                "open_interest": round(oi_score, 3),
-                "funding_rate": round(funding_score, 3),
-                "big_whales": round(big_player_score, 3),
-                "big_accounts": round(big_account_score, 3),
-                "retail_inverse": round(crowd_inverse_score, 3),
-                "volume_emotion": round(volume_score, 3),
-            }
-        }
+        return _score_sentiment(symbol, interval, kl, cur_oi, funding, top_pos, top_acc, global_acc, oi_hist)
 
     except Exception as e:
         logging.error(f"Sentiment calc error: {e}")
-        return {
-            "symbol": symbol,
-            "interval": interval,
-            "sentiment_score": 50,
-            "tag": "⚪ Neutral",
-            "factors": {
-                "open_interest": 0,
-                "funding_rate": 0,
-                "big_whales": 0,
-                "big_accounts": 0,
-                "retail_inverse": 0,
-                "volume_emotion": 0,
-            }
-        }
+        return _sentiment_fallback(symbol, interval)